@@ -0,0 +1,262 @@
+"""
+AssemblyAI 异步转录客户端
+  - 所有请求复用一个 aiohttp 连接池（keep-alive，避免每次请求重新握手TLS）
+  - 轮询转录状态时使用指数退避，而不是固定每3秒一次
+  - 所有转录任务运行在同一个后台事件循环中，几十个视频同时转录也不需要为每个任务阻塞一个线程
+同步代码通过 run_coroutine() 把协程提交到后台事件循环，拿到 concurrent.futures.Future
+"""
+
+import asyncio
+import atexit
+import os
+import threading
+
+from structured_log import get_logger, span
+
+# AssemblyAI 配置
+ASSEMBLYAI_BASE_URL = os.getenv("ASSEMBLYAI_BASE_URL", "https://api.assemblyai.com")
+ASSEMBLYAI_MAX_CONNECTIONS = int(os.getenv("ASSEMBLYAI_MAX_CONNECTIONS", "10"))  # 连接池大小
+ASSEMBLYAI_MAX_JOBS = int(os.getenv("ASSEMBLYAI_MAX_JOBS", "20"))                # 同时进行的转录任务上限
+
+# 轮询退避：首次间隔、最大间隔（秒）和每次增长倍数
+POLL_INITIAL_INTERVAL = float(os.getenv("ASSEMBLYAI_POLL_INITIAL", "3"))
+POLL_MAX_INTERVAL = float(os.getenv("ASSEMBLYAI_POLL_MAX", "30"))
+POLL_BACKOFF = 1.5
+# 单个转录任务最长等待时间（秒），超时后放弃，避免卡住的任务让整次运行无法结束
+TRANSCRIPT_TIMEOUT = float(os.getenv("ASSEMBLYAI_TRANSCRIPT_TIMEOUT", "3600"))
+
+# 上传时每次读取的块大小、失败重试次数和重试间隔（秒）
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+UPLOAD_RETRIES = int(os.getenv("ASSEMBLYAI_UPLOAD_RETRIES", "3"))
+UPLOAD_RETRY_DELAY = 5
+
+# 跟随正在下载的文件上传时，读到文件末尾后等待新数据的间隔（秒）
+GROWING_FILE_POLL = 0.2
+
+logger = get_logger("assemblyai")
+
+# 转录参数
+TRANSCRIPT_OPTIONS = {
+    "speech_model": "universal",
+    "language_detection": True,  # 启用自动语言检测
+    "auto_chapters": False,
+    "summarization": False,
+    "sentiment_analysis": False
+}
+
+
+def poll_interval(attempt, audio_duration=None):
+    """
+    计算第 attempt 次轮询前的等待时间
+
+    指数退避，上限为 POLL_MAX_INTERVAL；已知音频时长时，上限再收紧到音频时长的 5%，
+    这样短音频不会因为退避过头而白白多等
+    """
+    interval = POLL_INITIAL_INTERVAL * (POLL_BACKOFF ** attempt)
+    ceiling = POLL_MAX_INTERVAL
+    if audio_duration:
+        ceiling = min(ceiling, max(POLL_INITIAL_INTERVAL, audio_duration * 0.05))
+    return min(interval, ceiling)
+
+
+class AssemblyAIClient:
+    """AssemblyAI 异步客户端，必须在同一个事件循环中使用"""
+
+    def __init__(self, api_key, base_url=ASSEMBLYAI_BASE_URL,
+                 max_connections=ASSEMBLYAI_MAX_CONNECTIONS, max_jobs=ASSEMBLYAI_MAX_JOBS):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.max_connections = max_connections
+        self._jobs = asyncio.Semaphore(max(1, max_jobs))
+        self._session = None
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            import aiohttp  # 导入较慢，只在第一次发请求时加载
+
+            self._session = aiohttp.ClientSession(
+                headers={"authorization": self.api_key},
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+            )
+        return self._session
+
+    async def upload(self, audio_file, download_future=None):
+        """
+        上传本地音频文件，返回 upload_url
+
+        传入 download_future 时文件仍在下载，上传会跟随文件增长，直到下载完成再结束请求体。
+        /v2/upload 不支持断点续传，上传失败时等待下载完成后从本地完整文件重新上传
+        """
+        for attempt in range(1, UPLOAD_RETRIES + 1):
+            try:
+                return await self._upload_once(audio_file, download_future)
+            except Exception as e:
+                # 下载本身失败时没有可上传的完整文件，直接抛出
+                if download_future is not None and download_future.done() and download_future.exception():
+                    raise download_future.exception()
+                if attempt >= UPLOAD_RETRIES:
+                    raise
+                logger.warning(f"⚠️ 上传失败 (第 {attempt}/{UPLOAD_RETRIES} 次)，错误: {e}")
+                if download_future is not None:
+                    await asyncio.wrap_future(download_future)
+                    download_future = None
+                await asyncio.sleep(UPLOAD_RETRY_DELAY * attempt)
+
+    async def _upload_once(self, audio_file, download_future):
+        async def file_chunks():
+            with open(audio_file, "rb") as f:
+                while True:
+                    chunk = await asyncio.to_thread(f.read, UPLOAD_CHUNK_SIZE)
+                    if chunk:
+                        yield chunk
+                        continue
+                    if download_future is None:
+                        break
+                    if download_future.done():
+                        download_future.result()  # 下载失败时抛出异常，中止上传
+                        rest = await asyncio.to_thread(f.read)
+                        if rest:
+                            yield rest
+                        break
+                    # 文件暂时读到末尾但下载还在进行，稍等再读
+                    await asyncio.sleep(GROWING_FILE_POLL)
+
+        async with self._get_session().post(self.base_url + "/v2/upload", data=file_chunks()) as response:
+            if response.status != 200:
+                raise RuntimeError(f"文件上传失败: {await response.text()}")
+            return (await response.json())["upload_url"]
+
+    async def create_transcript(self, audio_url):
+        """创建转录任务，返回 transcript_id"""
+        data = dict(TRANSCRIPT_OPTIONS, audio_url=audio_url)
+        async with self._get_session().post(self.base_url + "/v2/transcript", json=data) as response:
+            if response.status != 200:
+                raise RuntimeError(f"转录任务创建失败: {await response.text()}")
+            return (await response.json())["id"]
+
+    async def wait_for_transcript(self, transcript_id, timeout=None):
+        """按退避间隔轮询转录状态，完成后返回转录文本；超过 timeout 秒（默认 TRANSCRIPT_TIMEOUT）仍未完成时抛出 TimeoutError"""
+        polling_endpoint = f"{self.base_url}/v2/transcript/{transcript_id}"
+        deadline = asyncio.get_running_loop().time() + (TRANSCRIPT_TIMEOUT if timeout is None else timeout)
+        attempt = 0
+        audio_duration = None
+        while True:
+            async with self._get_session().get(polling_endpoint) as response:
+                transcription_result = await response.json()
+
+            status = transcription_result["status"]
+            if status == "completed":
+                return transcription_result["text"]
+            if status == "error":
+                raise RuntimeError(f"转录失败: {transcription_result['error']}")
+
+            audio_duration = transcription_result.get("audio_duration") or audio_duration
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                raise TimeoutError(f"转录任务 {transcript_id} 等待超时（状态: {status}）")
+            delay = min(poll_interval(attempt, audio_duration), remaining)
+            logger.info(f"📊 转录状态 [{transcript_id}]: {status}，{delay:.0f}s 后再次检查...")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def transcribe(self, audio_file, download_future=None, resume=None, on_progress=None):
+        """
+        上传 -> 创建任务 -> 等待完成，返回转录文本
+
+        resume 可以带上之前运行留下的 upload_url / transcript_id，从对应步骤继续（已失效时重新上传）；
+        on_progress(stage, **fields) 在上传完成（uploaded, upload_url）和任务创建后（transcript_created, transcript_id）调用
+        """
+        resume = resume or {}
+        async with self._jobs:
+            transcript_id = resume.get("transcript_id")
+            if transcript_id:
+                logger.info(f"♻️ 继续等待已创建的转录任务，ID: {transcript_id}")
+                try:
+                    with span("transcription_wait", transcript_id=transcript_id):
+                        text = await self.wait_for_transcript(transcript_id)
+                    logger.info("✅ 转录完成!")
+                    return text
+                except Exception as e:
+                    logger.warning(f"⚠️ 已创建的转录任务不可用，重新转录: {e}")
+
+            audio_url = resume.get("upload_url")
+            if audio_url:
+                logger.info("♻️ 复用已上传的音频文件")
+                try:
+                    transcript_id = await self.create_transcript(audio_url)
+                except Exception as e:
+                    logger.warning(f"⚠️ 已上传的音频不可用，重新上传: {e}")
+                    audio_url = None
+
+            if not audio_url:
+                logger.info("📤 正在上传音频文件...")
+                with span("upload"):
+                    audio_url = await self.upload(audio_file, download_future)
+                logger.info("✅ 文件上传成功")
+                if on_progress:
+                    on_progress("uploaded", upload_url=audio_url)
+
+                logger.info("🔄 创建转录任务...")
+                transcript_id = await self.create_transcript(audio_url)
+            logger.info(f"📋 转录任务已创建，ID: {transcript_id}")
+            if on_progress:
+                on_progress("transcript_created", transcript_id=transcript_id)
+
+            logger.info("⏳ 等待转录完成...")
+            with span("transcription_wait", transcript_id=transcript_id):
+                text = await self.wait_for_transcript(transcript_id)
+            logger.info("✅ 转录完成!")
+            return text
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+
+# 后台事件循环（整个进程共享一个），以及绑定在其上的客户端
+_loop = None
+_loop_lock = threading.Lock()
+_clients = {}
+
+
+def _get_loop():
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="assemblyai-loop", daemon=True).start()
+        return _loop
+
+
+def run_coroutine(coro):
+    """把协程提交到后台事件循环执行，返回 concurrent.futures.Future"""
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop())
+
+
+def get_assemblyai_client(api_key):
+    """获取绑定在后台事件循环上的共享客户端（只能在该事件循环中使用）"""
+    _get_loop()
+    with _loop_lock:
+        if api_key not in _clients:
+            _clients[api_key] = AssemblyAIClient(api_key)
+        return _clients[api_key]
+
+
+def shutdown():
+    """关闭所有客户端的连接池并停止后台事件循环（进程退出时自动调用）"""
+    global _loop
+    with _loop_lock:
+        loop, clients = _loop, list(_clients.values())
+        _loop = None
+        _clients.clear()
+    if loop is None:
+        return
+    for client in clients:
+        try:
+            asyncio.run_coroutine_threadsafe(client.close(), loop).result(timeout=5)
+        except Exception:
+            pass
+    loop.call_soon_threadsafe(loop.stop)
+
+
+atexit.register(shutdown)
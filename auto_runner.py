@@ -1,19 +1,27 @@
 #!/usr/bin/env python3
 """
 YouTube频道自动化监控脚本
-监控指定频道的新视频，自动调用yt_summarizer.py进行处理
+监控指定频道的新视频，自动调用yt_summarizer进行处理
 """
 
-import feedparser
-import subprocess
 import json
 import os
+import signal
 import sys
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import urlparse
 from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
+from channel_scheduler import ChannelScheduler
+from clients import get_http_session
+from file_utils import atomic_write_json, file_lock
+from processed_store import open_processed_store
+from structured_log import flush_logging, get_logger, setup_logging, shutdown_logging, span
+# 任务队列、邮件和流水线（连带 smtplib/asyncio/各服务商客户端）导入较慢，在首次使用时才加载，
+# 使 --help 等不需要处理视频的调用尽快返回
 
 # 获取脚本所在目录
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -23,9 +31,10 @@ load_dotenv()
 
 # 文件路径
 CHANNELS_FILE = os.path.join(SCRIPT_DIR, "channels.json")
-YT_SUMMARIZER = os.path.join(SCRIPT_DIR, "yt_summarizer.py")
 LOG_FILE = os.path.join(SCRIPT_DIR, "auto.log")
+LOG_JSON_FILE = os.getenv('LOG_JSON_FILE', os.path.join(SCRIPT_DIR, "auto.jsonl"))  # 结构化日志，设为空则不写
 PROCESSED_FILE = os.path.join(SCRIPT_DIR, "processed.json")
+FEED_STATE_FILE = os.path.join(SCRIPT_DIR, "feed_state.json")
 
 # 邮件配置
 EMAIL_SMTP_SERVER = os.getenv('EMAIL_SMTP_SERVER', 'smtp.gmail.com')
@@ -33,148 +42,333 @@ EMAIL_SMTP_PORT = int(os.getenv('EMAIL_SMTP_PORT', '587'))
 EMAIL_ADDRESS = os.getenv('EMAIL_ADDRESS')
 EMAIL_PASSWORD = os.getenv('EMAIL_PASSWORD')
 RECIPIENT_EMAIL = 'yzhou7771@gmail.com'
+EMAIL_DIGEST = os.getenv('EMAIL_DIGEST', '0') == '1'  # 每次运行只发送一封合并所有总结的摘要邮件
 
-def log(message):
-    """记录日志到文件和控制台"""
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    log_message = f"[{timestamp}] {message}"
-    print(log_message)
-    
-    # 写入日志文件
-    try:
-        with open(LOG_FILE, "a", encoding="utf-8") as f:
-            f.write(log_message + "\n")
-    except Exception as e:
-        print(f"警告：无法写入日志文件: {e}")
+# 频道发现并发配置
+DISCOVERY_CONCURRENCY = int(os.getenv('DISCOVERY_CONCURRENCY', '16'))       # 同时抓取的feed数量上限
+FEED_TIMEOUT = float(os.getenv('FEED_TIMEOUT', '15'))                        # 单个feed请求超时（秒）
+FEED_HOST_CONCURRENCY = int(os.getenv('FEED_HOST_CONCURRENCY', '8'))         # 同一主机的并发请求上限
+FEED_HOST_MIN_INTERVAL = float(os.getenv('FEED_HOST_MIN_INTERVAL', '0.05'))  # 同一主机两次请求的最小间隔（秒）
+FEED_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+# 频道feed地址模板（基准测试时可指向本地服务器）
+YOUTUBE_FEED_URL = os.getenv('YOUTUBE_FEED_URL', 'https://www.youtube.com/feeds/videos.xml?channel_id={channel_id}')
+
+# 常驻模式（--daemon）配置，各频道的检查间隔见 channel_scheduler
+DAEMON_RETRY_INTERVAL = float(os.getenv('DAEMON_RETRY_INTERVAL', '1800'))  # 重试中断任务的间隔（秒）
+
+logger = get_logger("auto_runner")
 
 def load_channels():
     """加载频道配置"""
     try:
         if not os.path.exists(CHANNELS_FILE):
-            log(f"❌ 频道配置文件不存在: {CHANNELS_FILE}")
+            logger.error(f"❌ 频道配置文件不存在: {CHANNELS_FILE}")
             return []
             
         with open(CHANNELS_FILE, "r", encoding="utf-8") as f:
             data = json.load(f)
             channels = data.get("channels", [])
-            log(f"📺 加载了 {len(channels)} 个频道配置")
+            logger.info(f"📺 加载了 {len(channels)} 个频道配置")
             return channels
     except Exception as e:
-        log(f"❌ 加载频道配置失败: {e}")
+        logger.error(f"❌ 加载频道配置失败: {e}")
         return []
 
-def load_processed_videos():
-    """加载已处理的视频记录"""
-    try:
-        if not os.path.exists(PROCESSED_FILE):
-            # 如果文件不存在，创建初始结构
-            processed_data = {"processed_videos": {}}
-            with open(PROCESSED_FILE, "w", encoding="utf-8") as f:
-                json.dump(processed_data, f, indent=2, ensure_ascii=False)
-            log("📋 创建了新的处理记录文件")
-            return processed_data["processed_videos"]
-        
-        with open(PROCESSED_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            processed = data.get("processed_videos", {})
-            log(f"📋 加载了 {len(processed)} 个已处理视频记录")
-            return processed
-            
-    except Exception as e:
-        log(f"❌ 加载处理记录失败: {e}")
-        return {}
+# 已处理视频存储（首次使用时打开）
+_processed_store = None
+
+def get_processed_store():
+    """获取已处理视频存储（整个运行期间只打开一次）"""
+    global _processed_store
+    if _processed_store is None:
+        store = open_processed_store(legacy_json=PROCESSED_FILE)
+        if store.migrated_count:
+            logger.info(f"📋 从 processed.json 迁移了 {store.migrated_count} 条处理记录")
+        logger.info(f"📋 已处理视频记录: {store.count()} 条")
+        _processed_store = store
+    return _processed_store
+
+def close_processed_store():
+    """把缓冲中的处理记录持久化并关闭存储"""
+    global _processed_store
+    if _processed_store is not None:
+        try:
+            _processed_store.close()
+        except Exception as e:
+            logger.error(f"❌ 保存处理记录失败: {e}")
+        _processed_store = None
+
+# 视频处理断点（首次使用时打开）
+_job_queue = None
+
+def get_job_queue():
+    """获取记录各视频处理阶段的任务队列（整个运行期间只打开一次）"""
+    global _job_queue
+    if _job_queue is None:
+        from job_queue import JobQueue
+        _job_queue = JobQueue()
+    return _job_queue
+
+def close_job_queue():
+    """关闭任务队列"""
+    global _job_queue
+    if _job_queue is not None:
+        _job_queue.close()
+        _job_queue = None
+
+def mark_emailed(video_id, error=None):
+    """邮件发送成功后结束对应的任务；发送失败的任务保留，下次运行补发"""
+    if error is None:
+        jobs = get_job_queue()
+        jobs.advance(video_id, "emailed")
+        jobs.finish(video_id)
 
 def save_processed_video(video_id, video_info):
     """保存已处理的视频记录"""
     try:
-        processed = load_processed_videos()
-        processed[video_id] = {
-            "title": video_info["title"],
-            "url": video_info["url"],
-            "channel": video_info["channel_title"],
-            "published": str(video_info["published"]),
-            "processed_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
-        
-        # 保存到文件
-        data = {"processed_videos": processed}
-        with open(PROCESSED_FILE, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        with span("ledger_mark", video_id=video_id):
+            get_processed_store().mark_processed(video_id, {
+                "title": video_info["title"],
+                "url": video_info["url"],
+                "channel": video_info["channel_title"],
+                "published": str(video_info["published"]),
+                "processed_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            })
         
-        log(f"📋 记录已处理视频: {video_info['title']}")
+        logger.info(f"📋 记录已处理视频: {video_info['title']}")
         return True
         
     except Exception as e:
-        log(f"❌ 保存处理记录失败: {e}")
+        logger.error(f"❌ 保存处理记录失败: {e}")
         return False
 
-def is_video_processed(video_id):
-    """检查视频是否已经处理过"""
+def filter_unprocessed_videos(videos):
+    """批量检查视频是否已经处理过，返回未处理的视频"""
     try:
-        processed = load_processed_videos()
-        return video_id in processed
+        with span("ledger_check", videos=len(videos)):
+            unprocessed_ids = set(get_processed_store().filter_unprocessed([video['id'] for video in videos]))
     except Exception as e:
-        log(f"❌ 检查处理记录失败: {e}")
-        return False
+        logger.error(f"❌ 检查处理记录失败: {e}")
+        return list(videos)
+    return [video for video in videos if video['id'] in unprocessed_ids]
+
+# 本次运行内的频道feed缓存（频道ID -> 解析后的feed），保证每个频道只下载解析一次
+_feed_cache = {}
+
+# 按主机限流的状态（主机名 -> 信号量 / 下一次允许发起请求的时间）
+_host_lock = threading.Lock()
+_host_semaphores = {}
+_host_next_slot = {}
+
+@contextmanager
+def _host_slot(host):
+    """占用一个主机请求名额，并保证同一主机的请求之间有最小间隔"""
+    with _host_lock:
+        semaphore = _host_semaphores.setdefault(host, threading.BoundedSemaphore(FEED_HOST_CONCURRENCY))
+    
+    semaphore.acquire()
+    try:
+        with _host_lock:
+            now = time.monotonic()
+            slot = max(now, _host_next_slot.get(host, now))
+            _host_next_slot[host] = slot + FEED_HOST_MIN_INTERVAL
+        if slot > now:
+            time.sleep(slot - now)
+        yield
+    finally:
+        semaphore.release()
+
+# 各频道feed的缓存校验信息（ETag / Last-Modified），跨运行持久化
+_validators_lock = threading.Lock()
+_feed_validators = None
+_pending_validators = {}
+
+def load_feed_validators():
+    """加载上次运行保存的feed校验信息"""
+    global _feed_validators
+    with _validators_lock:
+        if _feed_validators is None:
+            try:
+                if os.path.exists(FEED_STATE_FILE):
+                    with open(FEED_STATE_FILE, "r", encoding="utf-8") as f:
+                        _feed_validators = json.load(f).get("feeds", {})
+                else:
+                    _feed_validators = {}
+            except Exception as e:
+                logger.warning(f"⚠️ 加载feed校验信息失败: {e}")
+                _feed_validators = {}
+        return _feed_validators
+
+def save_feed_validators(skip_channels=()):
+    """保存本次获取到的feed校验信息，skip_channels中的频道保留旧值以便下次重新检查"""
+    validators = load_feed_validators()
+    with _validators_lock:
+        updates = {channel_id: entry for channel_id, entry in _pending_validators.items()
+                   if channel_id not in skip_channels}
+        validators.update(updates)
+        _pending_validators.clear()
+    
+    try:
+        # 加锁后重新读取磁盘上的状态再合并，避免覆盖其他进程同时写入的频道
+        with file_lock(FEED_STATE_FILE):
+            feeds = {}
+            if os.path.exists(FEED_STATE_FILE):
+                try:
+                    with open(FEED_STATE_FILE, "r", encoding="utf-8") as f:
+                        feeds = json.load(f).get("feeds", {})
+                except ValueError:
+                    feeds = {}
+            feeds.update(updates)
+            atomic_write_json(FEED_STATE_FILE, {"feeds": feeds})
+    except Exception as e:
+        logger.warning(f"⚠️ 保存feed校验信息失败: {e}")
+
+def fetch_channel_feed(channel_id):
+    """获取频道RSS feed，同一次运行内重复调用直接返回缓存结果；feed未更新(304)时返回None"""
+    if channel_id in _feed_cache:
+        return _feed_cache[channel_id]
+    
+    feed_url = YOUTUBE_FEED_URL.format(channel_id=channel_id)
+    logger.info(f"🔍 检查频道: {channel_id}")
+    
+    # 带上次的校验信息发起条件请求
+    headers = {"User-Agent": FEED_USER_AGENT}
+    validators = load_feed_validators().get(channel_id, {})
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+    
+    # 先用带超时的请求下载，避免单个慢feed卡住整个发现阶段
+    with span("feed_fetch", channel_id=channel_id), _host_slot(urlparse(feed_url).netloc):
+        response = get_http_session().get(feed_url, headers=headers, timeout=FEED_TIMEOUT)
+    
+    if response.status_code == 304:
+        _feed_cache[channel_id] = None
+        return None
+    response.raise_for_status()
+    
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    if etag or last_modified:
+        with _validators_lock:
+            _pending_validators[channel_id] = {"etag": etag, "last_modified": last_modified}
+    
+    import feedparser  # 导入较慢，只在真正需要解析feed时加载
+    feed = feedparser.parse(response.content)
+    _feed_cache[channel_id] = feed
+    return feed
 
-def get_channel_videos(channel_id, target_date):
-    """获取指定频道在目标日期发布的视频"""
+def scan_channel_feed(channel_id, since):
+    """扫描频道feed，一次返回发布日期不早于since的所有视频，并把发布时间交给调度器安排下次检查"""
     try:
-        feed_url = f"https://www.youtube.com/feeds/videos.xml?channel_id={channel_id}"
-        log(f"🔍 检查频道: {channel_id}")
+        feed = fetch_channel_feed(channel_id)
         
-        feed = feedparser.parse(feed_url)
+        if feed is None:
+            logger.info(f"⏭️ 频道 {channel_id} 自上次检查后无更新，跳过")
+            get_scheduler().record_check(channel_id)
+            return []
         
         if not hasattr(feed, 'entries') or not feed.entries:
-            log(f"⚠️ 频道 {channel_id} 无法获取视频或无视频")
+            logger.warning(f"⚠️ 频道 {channel_id} 无法获取视频或无视频")
+            get_scheduler().record_check(channel_id)
             return []
         
         videos = []
+        upload_times = {}
         for entry in feed.entries:
             try:
                 # 解析发布时间
                 published_str = entry.published.replace("Z", "+00:00")
-                published = datetime.fromisoformat(published_str).date()
+                published_at = datetime.fromisoformat(published_str)
+                published = published_at.date()
+                upload_times[entry.yt_videoid] = published_at
                 
-                if published == target_date:
+                if published >= since:
                     video_info = {
                         'id': entry.yt_videoid,
+                        'channel_id': channel_id,
                         'url': entry.link,
                         'title': entry.title,
                         'published': published,
                         'channel_title': entry.author
                     }
                     videos.append(video_info)
-                    log(f"✅ 发现新视频: {entry.title}")
+                    logger.info(f"✅ 发现新视频: {entry.title}")
             except Exception as e:
-                log(f"⚠️ 解析视频条目失败: {e}")
+                logger.warning(f"⚠️ 解析视频条目失败: {e}")
                 continue
         
+        get_scheduler().record_check(channel_id, upload_times, feed.entries[0].get('author'))
         return videos
         
     except Exception as e:
-        log(f"❌ 获取频道 {channel_id} 视频失败: {e}")
+        logger.error(f"❌ 获取频道 {channel_id} 视频失败: {e}")
+        get_scheduler().record_failure(channel_id)
         return []
 
-def send_email_summary(video_info, folder_path, summary_text):
-    """发送总结邮件到指定邮箱"""
-    if not EMAIL_ADDRESS or not EMAIL_PASSWORD:
-        log("⚠️ 未配置邮件账户信息，跳过邮件发送")
-        return False
-    
+# 各频道的检查计划（首次使用时加载）
+_scheduler = None
+
+def get_scheduler():
+    """获取频道检查调度器（整个运行期间只加载一次）"""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = ChannelScheduler(ledger=get_processed_store())
+    return _scheduler
+
+def save_scheduler():
+    """保存各频道的检查计划"""
+    if _scheduler is None:
+        return
     try:
-        log(f"📧 正在发送邮件: {video_info['title']}")
-        
-        # 创建邮件内容
-        msg = MIMEMultipart()
-        msg['From'] = EMAIL_ADDRESS
-        msg['To'] = RECIPIENT_EMAIL
-        msg['Subject'] = f"YouTube视频总结 - {video_info['channel_title']}"
-        
-        # 邮件正文
-        body = f"""
-YouTube视频总结报告
+        _scheduler.save()
+    except Exception as e:
+        logger.warning(f"⚠️ 保存频道检查计划失败: {e}")
+
+def discover_videos(channels, since):
+    """并发扫描所有频道feed，按频道顺序合并为process_video可用的视频列表"""
+    if not channels:
+        return []
+    
+    max_workers = max(1, min(DISCOVERY_CONCURRENCY, len(channels)))
+    logger.info(f"🌐 并发检查 {len(channels)} 个频道 (并发数: {max_workers})")
+    
+    all_videos = []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for videos in pool.map(lambda channel_id: scan_channel_feed(channel_id, get_scheduler().since(channel_id, since)),
+                               channels):
+            all_videos.extend(videos)
+    
+    return all_videos
+
+_mailer = None
+_mailer_lock = threading.Lock()  # 总结线程并发调用 get_mailer()，保证只创建一个发送器
+_digest_entries = []
+_digest_lock = threading.Lock()
 
+def _on_email_result(label, error):
+    """后台发送线程每发完一封邮件时记录结果"""
+    if error is None:
+        logger.info(f"✅ 邮件发送成功: {label}")
+    else:
+        logger.error(f"❌ 邮件发送失败: {label}, 错误: {error}")
+
+def get_mailer():
+    """获取本次运行共享的邮件发送器（复用一个SMTP连接），未配置邮件账户时返回None"""
+    global _mailer
+    if not EMAIL_ADDRESS or not EMAIL_PASSWORD:
+        return None
+    with _mailer_lock:
+        if _mailer is None:
+            from mailer import Mailer
+            _mailer = Mailer(EMAIL_SMTP_SERVER, EMAIL_SMTP_PORT, EMAIL_ADDRESS, EMAIL_PASSWORD,
+                             on_result=_on_email_result)
+        return _mailer
+
+def format_summary_body(video_info, folder_path, summary_text):
+    """单个视频的总结内容"""
+    return f"""
 📹 视频标题: {video_info['title']}
 🔗 视频链接: {video_info['url']}
 📺 频道名称: {video_info['channel_title']}
@@ -184,164 +378,350 @@ YouTube视频总结报告
 
 📋 内容总结:
 {summary_text}
+"""
 
----
-此邮件由YouTube自动化监控系统发送
-        """
-        
-        msg.attach(MIMEText(body, 'plain', 'utf-8'))
-        
-        # 连接SMTP服务器并发送邮件
-        server = smtplib.SMTP(EMAIL_SMTP_SERVER, EMAIL_SMTP_PORT)
-        server.starttls()
-        server.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
-        text = msg.as_string()
-        server.sendmail(EMAIL_ADDRESS, RECIPIENT_EMAIL, text)
-        server.quit()
-        
-        log(f"✅ 邮件发送成功: {video_info['title']}")
-        return True
-        
-    except Exception as e:
-        log(f"❌ 邮件发送失败: {video_info['title']}, 错误: {e}")
+def send_email_summary(video_info, folder_path, summary_text):
+    """
+    把总结邮件放入后台发送队列（EMAIL_DIGEST 模式下加入本次运行的摘要邮件），立即返回
+    
+    发送结果由后台线程记录到日志；未配置邮件账户时返回False
+    """
+    mailer = get_mailer()
+    if mailer is None:
+        logger.warning("⚠️ 未配置邮件账户信息，跳过邮件发送")
         return False
+    
+    from mailer import build_message
+    
+    body = format_summary_body(video_info, folder_path, summary_text)
+    if EMAIL_DIGEST:
+        with _digest_lock:
+            _digest_entries.append((video_info['id'], body))
+        logger.info(f"📬 已加入摘要邮件: {video_info['title']}")
+        return True
+    
+    msg = build_message(EMAIL_ADDRESS, RECIPIENT_EMAIL,
+                        f"YouTube视频总结 - {video_info['channel_title']}",
+                        f"\nYouTube视频总结报告\n{body}\n---\n此邮件由YouTube自动化监控系统发送\n")
+    mailer.send(msg, label=video_info['title'], on_done=lambda error: mark_emailed(video_info['id'], error))
+    logger.info(f"📧 邮件已加入发送队列: {video_info['title']}")
+    return True
 
-def process_video(video_info):
-    """处理单个视频，包括邮件发送"""
-    try:
-        log(f"📹 开始处理视频: {video_info['title']}")
-        log(f"🔗 视频链接: {video_info['url']}")
+def flush_digest():
+    """把已积累的总结合并为一封摘要邮件放入发送队列（EMAIL_DIGEST 模式）"""
+    mailer = _mailer
+    if mailer is None:
+        return
+    from mailer import build_message
+    
+    with _digest_lock:
+        entries = list(_digest_entries)
+        _digest_entries.clear()
+    if entries:
+        body = "\n" + "\n---\n".join(body for _, body in entries) + "\n---\n此邮件由YouTube自动化监控系统发送\n"
+        subject = f"YouTube视频总结 - {datetime.now().strftime('%Y-%m-%d')} ({len(entries)} 个视频)"
+        video_ids = [video_id for video_id, _ in entries]
         
-        # 调用yt_summarizer.py处理视频
-        result = subprocess.run([
-            sys.executable, YT_SUMMARIZER, video_info['url']
-        ], cwd=SCRIPT_DIR, capture_output=True, text=True, timeout=3600)  # 1小时超时
+        def on_done(error):
+            for video_id in video_ids:
+                mark_emailed(video_id, error)
         
-        if result.returncode == 0:
-            log(f"✅ 视频处理成功: {video_info['title']}")
-            
-            # 查找生成的文件夹和总结内容
-            try:
-                # 从输出中提取文件夹路径
-                output_lines = result.stdout.split('\n')
-                folder_path = None
-                
-                for line in output_lines:
-                    if '所有文件已保存到文件夹:' in line:
-                        folder_path = line.split('所有文件已保存到文件夹:')[-1].strip()
-                        break
-                
-                if folder_path and os.path.exists(folder_path):
-                    summary_file = os.path.join(folder_path, "summary.txt")
-                    
-                    if os.path.exists(summary_file):
-                        # 读取总结内容
-                        with open(summary_file, 'r', encoding='utf-8') as f:
-                            summary_text = f.read()
-                        
-                        # 发送邮件
-                        if send_email_summary(video_info, os.path.basename(folder_path), summary_text):
-                            log(f"📧 邮件发送完成: {video_info['title']}")
-                        else:
-                            log(f"⚠️ 邮件发送失败，但视频处理成功: {video_info['title']}")
-                    else:
-                        log(f"⚠️ 找不到总结文件: {summary_file}")
-                else:
-                    log(f"⚠️ 找不到输出文件夹: {folder_path}")
-            
-            except Exception as e:
-                log(f"⚠️ 邮件处理异常: {video_info['title']}, 错误: {e}")
-            
-            # 记录已处理的视频
-            save_processed_video(video_info['id'], video_info)
-            
-            return True
-        else:
-            log(f"❌ 视频处理失败: {video_info['title']}")
-            log(f"错误输出: {result.stderr}")
-            return False
-            
-    except subprocess.TimeoutExpired:
-        log(f"⏰ 视频处理超时: {video_info['title']}")
-        return False
-    except Exception as e:
-        log(f"❌ 处理视频异常: {video_info['title']}, 错误: {e}")
-        return False
+        mailer.send(build_message(EMAIL_ADDRESS, RECIPIENT_EMAIL, subject, body),
+                    label=f"摘要邮件 ({len(entries)} 个视频)", on_done=on_done)
+        logger.info(f"📬 发送摘要邮件: {len(entries)} 个视频")
 
-def main():
-    """主函数"""
-    log("🚀 YouTube自动化监控启动")
-    
-    # 检查必要文件
-    if not os.path.exists(YT_SUMMARIZER):
-        log(f"❌ yt_summarizer.py 不存在: {YT_SUMMARIZER}")
+def close_mailer():
+    """发送本次运行的摘要邮件（如有），等待队列中的邮件全部发送完毕并断开SMTP连接"""
+    global _mailer
+    if _mailer is None:
         return
+    flush_digest()
+    with _mailer_lock:
+        mailer, _mailer = _mailer, None
+    if mailer is not None:
+        mailer.close()
+
+def handle_video_done(video_info, result):
+    """视频流水线完成后的收尾：发送邮件并记录已处理"""
+    timings = ", ".join(f"{stage} {seconds:.1f}s" for stage, seconds in result.timings.items())
+    logger.info(f"✅ 视频处理成功: {video_info['title']} ({timings})")
+    if result.costs:
+        costs = ", ".join(f"{stage} ${cost:.4f}" for stage, cost in result.costs.items())
+        logger.info(f"💰 估算费用: ${sum(result.costs.values()):.4f} ({costs})")
     
-    # 加载频道配置
-    channels = load_channels()
-    if not channels:
-        log("❌ 没有可用的频道配置，退出")
+    if result.summary:
+        try:
+            # 发送邮件
+            if not send_email_summary(video_info, os.path.basename(result.folder), result.summary):
+                logger.warning(f"⚠️ 邮件未发送，但视频处理成功: {video_info['title']}")
+                get_job_queue().finish(video_info['id'])
+        except Exception as e:
+            logger.warning(f"⚠️ 邮件处理异常: {video_info['title']}, 错误: {e}")
+    else:
+        logger.warning(f"⚠️ 总结生成失败，跳过邮件: {video_info['title']}, 错误: {result.error}")
+    
+    # 记录已处理的视频
+    save_processed_video(video_info['id'], video_info)
+
+def handle_video_error(video_info, error):
+    """视频在任一阶段失败时记录日志"""
+    logger.error(f"❌ 处理视频异常: {video_info['title']}, 错误: {error}")
+
+def resend_summary_email(job):
+    """总结已生成但邮件未发出的任务：直接用保存的 summary.txt 补发邮件"""
+    summary_file = os.path.join(job.folder or "", "summary.txt")
+    if not job.folder or not os.path.exists(summary_file):
+        logger.warning(f"⚠️ 找不到总结文件，无法补发邮件: {job.video_info['title']}")
+        get_job_queue().finish(job.video_id, error="总结文件不存在")
         return
+    with open(summary_file, "r", encoding="utf-8") as f:
+        summary = f.read()
+    logger.info(f"♻️ 补发未发送的总结邮件: {job.video_info['title']}")
+    if not send_email_summary(job.video_info, os.path.basename(job.folder), summary):
+        get_job_queue().finish(job.video_id)
+
+def collect_jobs(new_videos, include_pending=True, busy=()):
+    """
+    把新发现的视频登记到任务队列，并接上之前运行中断的任务（include_pending），返回本次需要进入流水线的视频
+    
+    busy 为正在流水线中处理的视频ID（常驻模式），这些视频不会被重复加入
+    只差邮件的任务直接补发邮件；尝试次数超过 JOB_MAX_ATTEMPTS 的任务不再处理；
+    已经处理完成的视频（处理记录在批量落盘前被中断而丢失）只补记处理记录，不再重新处理和发送邮件
+    """
+    from job_queue import MAX_ATTEMPTS as JOB_MAX_ATTEMPTS
+    
+    jobs = get_job_queue()
+    candidates = []
+    for video in new_videos:
+        if video['id'] in busy:
+            continue
+        if not jobs.enqueue(video):
+            job = jobs.get(video['id'])
+            if job is not None and job.finished_at and job.reached("summarized"):
+                logger.info(f"⏭️ 之前的运行已处理完成，补记处理记录: {video['title']}")
+                save_processed_video(video['id'], video)
+                continue
+        candidates.append((video, None))
+    
+    new_ids = {video['id'] for video in new_videos}
+    for job in (jobs.pending() if include_pending else []):
+        if job.video_id not in new_ids and job.video_id not in busy:
+            candidates.append((job.video_info, job))
     
-    # 计算目标日期（今天和昨天）
+    videos = []
+    for video, job in candidates:
+        attempts = jobs.start_attempt(video['id'])
+        if attempts > JOB_MAX_ATTEMPTS:
+            logger.info(f"⛔ 已尝试 {JOB_MAX_ATTEMPTS} 次仍未完成，不再处理: {video['title']}")
+            jobs.finish(video['id'], error=f"超过最大尝试次数 ({JOB_MAX_ATTEMPTS})")
+        elif job is not None and job.reached("summarized"):
+            resend_summary_email(job)
+        else:
+            if job is not None:
+                logger.info(f"♻️ 恢复未完成的任务: {video['title']} (已完成阶段: {job.stage})")
+            videos.append(video)
+    return videos
+
+def process_videos(videos):
+    """通过分阶段流水线并行处理视频，返回 (成功数, 失败的频道ID集合)"""
+    from pipeline import run_pipeline
+    
+    for video in videos:
+        logger.info(f"📹 加入处理队列: {video['title']} ({video['url']})")
+    
+    outcomes = run_pipeline(videos, on_complete=handle_video_done, on_error=handle_video_error, base_dir=SCRIPT_DIR,
+                            jobs=get_job_queue())
+    
+    success_count = 0
+    failed_channels = set()
+    for video, outcome in outcomes:
+        if isinstance(outcome, Exception):
+            failed_channels.add(video['channel_id'])
+        else:
+            success_count += 1
+    return success_count, failed_channels
+
+def gather_videos(channels, include_pending=True, busy=()):
+    """
+    检查一批频道新发布的视频，登记到任务队列（include_pending 时一并接上之前中断的任务），返回需要处理的视频
+    
+    每个频道检查昨天以来的视频；频道因调度跳过了若干次检查时，从上次检查的日期开始检查。
+    busy 中的视频正在处理，不会重复返回
+    """
     today = datetime.now(timezone.utc).date()
     yesterday = today - timedelta(days=1)
-    log(f"🗓️ 检查日期: {yesterday} 和 {today}")
-    
-    # 收集所有新视频
-    all_new_videos = []
+    logger.info(f"🗓️ 检查 {len(channels)} 个频道自 {yesterday} 以来发布的视频")
     
-    for channel_id in channels:
-        # 检查昨天的视频
-        yesterday_videos = get_channel_videos(channel_id, yesterday)
-        all_new_videos.extend(yesterday_videos)
-        
-        # 检查今天的视频
-        today_videos = get_channel_videos(channel_id, today)
-        all_new_videos.extend(today_videos)
+    # 并发收集所有新视频，每个频道的feed只解析一次
+    all_new_videos = discover_videos(channels, yesterday)
+    save_scheduler()
     
     # 过滤掉已处理的视频
-    unprocessed_videos = []
-    skipped_count = 0
+    unprocessed_videos = filter_unprocessed_videos(all_new_videos)
+    skipped_count = len(all_new_videos) - len(unprocessed_videos)
     
+    pending_ids = {video['id'] for video in unprocessed_videos}
     for video in all_new_videos:
-        video_id = video['id']
-        if is_video_processed(video_id):
-            log(f"⏭️ 跳过已处理视频: {video['title']}")
-            skipped_count += 1
-        else:
-            unprocessed_videos.append(video)
+        if video['id'] not in pending_ids:
+            logger.info(f"⏭️ 跳过已处理视频: {video['title']}")
+    
+    # 登记到任务队列，并加入之前运行中断的任务
+    new_count = len(unprocessed_videos)
+    videos_to_process = collect_jobs(unprocessed_videos, include_pending, busy)
     
     # 处理结果统计
-    if not unprocessed_videos:
+    if not videos_to_process:
         if all_new_videos:
-            log(f"✅ 发现 {len(all_new_videos)} 个视频，但全部已处理过，任务完成")
+            logger.info(f"✅ 发现 {len(all_new_videos)} 个视频，但全部已处理过或正在处理")
         else:
-            log("✅ 昨天和今天都没有新视频，任务完成")
-        return
+            logger.info("✅ 没有新视频")
+        return []
     
-    log(f"📊 共发现 {len(all_new_videos)} 个视频，其中 {len(unprocessed_videos)} 个未处理，{skipped_count} 个已跳过")
+    logger.info(f"📊 共发现 {len(all_new_videos)} 个视频，其中 {new_count} 个未处理，{skipped_count} 个已跳过")
+    resumed_count = len([video for video in videos_to_process if video['id'] not in pending_ids])
+    if resumed_count:
+        logger.info(f"♻️ 另有 {resumed_count} 个之前中断的视频继续处理")
+    return videos_to_process
+
+def check_channels(channels, include_pending=True):
+    """
+    检查一批频道新发布的视频并处理完毕（include_pending 时一并接上之前中断的任务）
     
-    # 处理每个视频
-    success_count = 0
-    failed_count = 0
+    返回 (成功数, 失败数)，没有需要处理的视频时返回 None
+    """
+    videos_to_process = gather_videos(channels, include_pending)
+    if not videos_to_process:
+        save_feed_validators()
+        return None
     
-    for video in unprocessed_videos:
-        if process_video(video):
-            success_count += 1
-        else:
-            failed_count += 1
+    # 分阶段并行处理所有视频
+    success_count, failed_channels = process_videos(videos_to_process)
+    
+    # 有失败视频的频道不更新校验信息，下次运行会重新下载feed并重试
+    save_feed_validators(skip_channels=failed_channels)
+    return success_count, len(videos_to_process) - success_count
+
+def main():
+    """主函数"""
+    logger.info("🚀 YouTube自动化监控启动")
+    
+    # 加载频道配置
+    channels = load_channels()
+    if not channels:
+        logger.error("❌ 没有可用的频道配置，退出")
+        return
+    
+    # 只检查到了检查时间的频道
+    due_channels = get_scheduler().due(channels)
+    if len(due_channels) < len(channels):
+        logger.info(f"⏭️ {len(channels) - len(due_channels)} 个频道未到检查时间，跳过")
+    counts = check_channels(due_channels)
+    
+    # 等待邮件发送完毕
+    close_mailer()
     
     # 总结
-    log(f"📈 处理完成: 成功 {success_count} 个，失败 {failed_count} 个")
-    log("🎉 YouTube自动化监控完成")
+    if counts is None:
+        logger.info("✅ 没有需要处理的视频，任务完成")
+        return
+    logger.info(f"📈 处理完成: 成功 {counts[0]} 个，失败 {counts[1]} 个")
+    logger.info("🎉 YouTube自动化监控完成")
+
+# 常驻模式的停止信号（Ctrl+C / SIGTERM 时不再检查频道，等正在处理的视频结束后退出）
+_stop_event = threading.Event()
+
+def request_stop(signum=None, frame=None):
+    """常驻模式的信号处理：第一次请求停止，再次收到信号时立即中断"""
+    if _stop_event.is_set():
+        raise KeyboardInterrupt
+    logger.info("🛑 收到停止信号，等待正在处理的视频完成后退出（再按一次 Ctrl+C 立即退出）")
+    _stop_event.set()
+
+def run_daemon():
+    """
+    常驻模式：按 channel_scheduler 为各频道安排的检查时间轮询feed，新视频立即交给长期运行的流水线处理
+    
+    轮询不等待视频处理完成，处理长视频期间其他频道照常检查；
+    已处理记录、任务队列、HTTP会话、SMTP连接和各服务商客户端在整个进程中只初始化一次；
+    channels.json 修改后自动重新加载
+    """
+    logger.info("🛰️ YouTube自动化监控以常驻模式启动")
+    from pipeline import Pipeline
+    
+    pipeline = Pipeline(on_complete=handle_video_done, on_error=handle_video_error, base_dir=SCRIPT_DIR,
+                        jobs=get_job_queue())
+    channels = []
+    channels_mtime = None
+    next_retry = 0.0  # 下次接上中断任务的时间（time.monotonic），启动后的第一轮立即进行
+    
+    try:
+        while not _stop_event.is_set():
+            try:
+                mtime = os.path.getmtime(CHANNELS_FILE)
+            except OSError:
+                mtime = None
+            if mtime != channels_mtime:
+                channels, channels_mtime = load_channels(), mtime
+            
+            due = get_scheduler().due(channels)
+            retry = time.monotonic() >= next_retry
+            if due or retry:
+                # 每次检查都重新请求feed（条件请求，未更新时服务器返回304）
+                for channel_id in due:
+                    _feed_cache.pop(channel_id, None)
+                try:
+                    videos = gather_videos(due, include_pending=retry, busy=pipeline.in_flight())
+                    # 失败的视频留在任务队列中按 DAEMON_RETRY_INTERVAL 重试，不需要重新下载feed
+                    save_feed_validators()
+                    for video in videos:
+                        logger.info(f"📹 加入处理队列: {video['title']} ({video['url']})")
+                        pipeline.submit(video)
+                except Exception as e:
+                    logger.error(f"❌ 本轮检查异常: {e}")
+                if retry:
+                    next_retry = time.monotonic() + DAEMON_RETRY_INTERVAL
+            
+            # 流水线空闲时把积累的总结合并发出、日志写到磁盘（便于随时查看本轮结果），并把处理记录落盘
+            if not pipeline.in_flight():
+                flush_digest()
+                flush_logging()
+            if _processed_store is not None:
+                _processed_store.flush()
+            
+            wait = next_retry - time.monotonic()
+            if channels:
+                wait = min(wait, get_scheduler().seconds_until_next(channels))
+            # 至少每分钟醒来一次，以便及时发现 channels.json 的变化和已处理完的视频
+            _stop_event.wait(min(60.0, max(1.0, wait)))
+    except BaseException:
+        pipeline.close(wait=False)
+        raise
+    
+    pipeline.close()
+    logger.info("👋 正在处理的视频已完成，常驻模式退出")
 
 if __name__ == "__main__":
+    if "-h" in sys.argv[1:] or "--help" in sys.argv[1:]:
+        print("用法: python auto_runner.py [--daemon]")
+        print("  默认检查一次所有频道后退出（适合cron）；--daemon 常驻运行，按各频道发布频率持续轮询")
+        sys.exit(0)
+    setup_logging(LOG_FILE, LOG_JSON_FILE or None)
     try:
-        main()
+        if "--daemon" in sys.argv[1:]:
+            signal.signal(signal.SIGTERM, request_stop)
+            signal.signal(signal.SIGINT, request_stop)
+            run_daemon()
+        else:
+            main()
     except KeyboardInterrupt:
-        log("⚠️ 用户中断操作")
+        logger.warning("⚠️ 用户中断操作")
         sys.exit(0)
     except Exception as e:
-        log(f"❌ 程序异常: {e}")
-        sys.exit(1)
\ No newline at end of file
+        logger.error(f"❌ 程序异常: {e}")
+        sys.exit(1)
+    finally:
+        # 无论正常结束还是中断，都把队列中的邮件发完、把缓冲中的处理记录落盘
+        close_mailer()
+        close_processed_store()
+        close_job_queue()
+        shutdown_logging()
\ No newline at end of file
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+启动耗时基准测试
+每个命令在新的子进程中重复运行多次，报告最短和中位耗时（已包含解释器本身的启动时间，
+以 `python -c pass` 作为基线）；--top 打印某个模块用 -X importtime 统计的最慢导入项
+
+用法:
+  python benchmarks/import_time.py [--runs 10] [--top yt_summarizer]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (名称, 命令参数)
+COMMANDS = [
+    ("python -c pass (基线)", ["-c", "pass"]),
+    ("import yt_summarizer", ["-c", "import yt_summarizer"]),
+    ("import pipeline", ["-c", "import pipeline"]),
+    ("import auto_runner", ["-c", "import auto_runner"]),
+    ("import processed_store", ["-c", "import processed_store"]),
+    ("yt_summarizer.py --help", ["yt_summarizer.py", "--help"]),
+    ("auto_runner.py --help", ["auto_runner.py", "--help"]),
+    ("result_cache.py stats", ["result_cache.py", "stats"]),
+]
+
+
+def time_command(args, runs):
+    """运行 runs 次，返回每次的耗时（毫秒）"""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + args, cwd=REPO_DIR, stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL, check=True)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def top_imports(module, limit=15):
+    """用 -X importtime 统计导入 module 时累计耗时最长的模块，返回 [(毫秒, 模块名)]"""
+    output = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=REPO_DIR, capture_output=True, text=True, check=True).stderr
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative) / 1000, name.rstrip()))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动耗时基准测试")
+    parser.add_argument("--runs", type=int, default=10, help="每个命令运行次数")
+    parser.add_argument("--top", metavar="MODULE", help="打印导入该模块时最慢的导入项")
+    args = parser.parse_args()
+
+    print(f"{'命令':<28}{'最短(ms)':>10}{'中位(ms)':>10}")
+    for name, command in COMMANDS:
+        timings = time_command(command, args.runs)
+        print(f"{name:<28}{min(timings):>10.1f}{statistics.median(timings):>10.1f}")
+
+    if args.top:
+        print(f"\n导入 {args.top} 最慢的模块（累计耗时）:")
+        for millis, name in top_imports(args.top):
+            print(f"{millis:>10.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+"""
+端到端流水线基准测试
+在本地替身上完整运行一次 auto_runner.main()：
+  - 频道 feed:    本地 HTTP 服务器按 fixtures/ 中的 YouTube feed 模板返回 N 个频道、每个频道 M 个今天发布的视频
+  - 视频信息/下载: 替换为在临时目录写入指定大小的假音频文件（可配置延迟）
+  - 转录:         本地 aiohttp 服务器模拟 AssemblyAI 的 upload / transcript / 轮询接口（--transcription-provider 可换成
+                  fake 等其他服务商）
+  - 总结:         fake 总结服务商（providers.FakeSummary，--summary-provider 可换成真实服务商）
+  - 处理记录:     临时目录中的 SQLite 存储
+  - 邮件:         本地 SMTP 替身（smtp_standin.py）
+报告各阶段延迟的 p50/p90/p99、吞吐量（视频/分钟）、各服务商的估算费用和峰值内存，并写入 JSON 文件，
+便于在不同提交、不同服务商之间对比（单价通过 ASSEMBLYAI_COST_PER_MIN 等环境变量设置）
+
+用法:
+  python benchmarks/pipeline_bench.py [--channels 5] [--videos 4] [--transcription-provider assemblyai]
+                                      [--summary-provider fake] [--output pipeline_bench.json]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import math
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from smtp_standin import SMTPStandin
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+sys.path.insert(0, REPO_DIR)
+
+# feed 中除今天发布的视频外，补足到 YouTube feed 的固定条目数（旧视频会被日期过滤掉）
+FEED_ENTRIES = 15
+
+
+# ========== 本地替身 ==========
+class FeedServer:
+    """按模板返回 YouTube 频道 feed 的本地 HTTP 服务器"""
+
+    def __init__(self, videos_per_channel, latency):
+        with open(os.path.join(FIXTURES_DIR, "youtube_feed.xml"), encoding="utf-8") as f:
+            self.feed_template = f.read()
+        with open(os.path.join(FIXTURES_DIR, "youtube_entry.xml"), encoding="utf-8") as f:
+            self.entry_template = f.read()
+        self.videos_per_channel = videos_per_channel
+        self.latency = latency
+        self.now = datetime.now(timezone.utc)
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                channel_id = parse_qs(urlparse(self.path).query).get("channel_id", [""])[0]
+                time.sleep(server.latency)
+                body = server.render(channel_id).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/atom+xml; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}/feeds/videos.xml?channel_id={{channel_id}}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def render(self, channel_id):
+        channel_title = f"Bench Channel {channel_id[-4:]}"
+        entries = []
+        for index in range(max(FEED_ENTRIES, self.videos_per_channel)):
+            # 前 M 个视频在几分钟前发布，其余是一周以前的旧视频
+            if index < self.videos_per_channel:
+                published = self.now - timedelta(minutes=index + 1)
+            else:
+                published = self.now - timedelta(days=7 + index)
+            entries.append(self.entry_template.format(
+                video_id=f"{channel_id[-4:]}v{index:06d}",
+                channel_id=channel_id,
+                channel_title=channel_title,
+                title=f"{channel_title} video {index}",
+                published=published.strftime("%Y-%m-%dT%H:%M:%S+00:00"),
+            ))
+        return self.feed_template.format(channel_id=channel_id, channel_title=channel_title,
+                                         entries="".join(entries))
+
+    def close(self):
+        self.httpd.shutdown()
+
+
+class FakeAssemblyAIServer:
+    """模拟 AssemblyAI 接口：上传读取完整请求体，转录任务在 latency 秒后完成"""
+
+    def __init__(self, latency, transcript_words, audio_duration):
+        from aiohttp import web
+
+        self.latency = latency
+        self.text = " ".join(["market update and outlook for the next quarter."] * max(1, transcript_words // 8))
+        self.audio_duration = audio_duration
+        self.jobs = {}
+        self.uploaded_bytes = 0
+
+        app = web.Application(client_max_size=1024 ** 3)
+        app.router.add_post("/v2/upload", self.upload)
+        app.router.add_post("/v2/transcript", self.create)
+        app.router.add_get("/v2/transcript/{id}", self.poll)
+        self.loop = asyncio.new_event_loop()
+        self.runner = web.AppRunner(app, access_log=None)
+        self.loop.run_until_complete(self.runner.setup())
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        self.loop.run_until_complete(site.start())
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}"
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+
+    async def upload(self, request):
+        from aiohttp import web
+        data = await request.read()
+        self.uploaded_bytes += len(data)
+        return web.json_response({"upload_url": f"{self.url}/files/{uuid.uuid4().hex}"})
+
+    async def create(self, request):
+        from aiohttp import web
+        await request.json()
+        transcript_id = uuid.uuid4().hex
+        self.jobs[transcript_id] = time.monotonic() + self.latency
+        return web.json_response({"id": transcript_id, "status": "queued"})
+
+    async def poll(self, request):
+        from aiohttp import web
+        ready_at = self.jobs.get(request.match_info["id"])
+        if ready_at is None:
+            return web.json_response({"status": "error", "error": "transcript not found"})
+        if time.monotonic() < ready_at:
+            return web.json_response({"status": "processing", "audio_duration": self.audio_duration})
+        # 每个任务的文本不同，避免命中总结缓存
+        text = f"Episode {request.match_info['id']}. {self.text}"
+        return web.json_response({"status": "completed", "text": text, "audio_duration": self.audio_duration})
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self.runner.cleanup(), self.loop).result(timeout=5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+# ========== 统计 ==========
+def percentile(values, pct):
+    """最近秩百分位数"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def summarize_latencies(values):
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "p50": round(percentile(values, 50), 4),
+        "p90": round(percentile(values, 90), 4),
+        "p99": round(percentile(values, 99), 4),
+        "mean": round(sum(values) / len(values), 4),
+        "max": round(max(values), 4),
+    }
+
+
+def peak_rss_mb():
+    """当前进程的峰值常驻内存（MB）；Linux 上 ru_maxrss 单位为 KB，macOS 上为字节"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+# ========== 基准测试 ==========
+def run_benchmark(args, work_dir):
+    feed_server = FeedServer(args.videos, args.feed_latency)
+    aai_server = FakeAssemblyAIServer(args.transcribe_latency, args.transcript_words, args.audio_duration)
+    smtp_standin = SMTPStandin(latency=args.smtp_latency)
+
+    # 必须在导入项目模块之前设置，这些配置在导入时读取
+    os.environ.update({
+        "YOUTUBE_FEED_URL": feed_server.url,
+        "ASSEMBLYAI_BASE_URL": aai_server.url,
+        "ASSEMBLYAI_API_KEY": "bench",
+        "ASSEMBLYAI_POLL_INITIAL": "0.2",
+        "ASSEMBLYAI_POLL_MAX": "1",
+        "TRANSCRIPTION_PROVIDER": args.transcription_provider,
+        "SUMMARY_PROVIDER": args.summary_provider,
+        "FAKE_TRANSCRIBE_LATENCY": str(args.transcribe_latency),
+        "FAKE_TRANSCRIPT_WORDS": str(args.transcript_words),
+        "FAKE_SUMMARY_LATENCY": str(args.summary_latency),
+        "YOUTUBE_RATE_PER_MIN": "0",
+        "PROCESSED_STORE": os.path.join(work_dir, "processed.db"),
+        "JOB_QUEUE_DB": os.path.join(work_dir, "jobs.db"),
+        "CHANNEL_SCHEDULE_FILE": os.path.join(work_dir, "channel_schedule.json"),
+        "PIPELINE_DOWNLOAD_WORKERS": str(args.download_workers),
+        "PIPELINE_SUMMARIZE_WORKERS": str(args.summarize_workers),
+        "EMAIL_SMTP_STARTTLS": "0",
+    })
+
+    import auto_runner
+    import result_cache
+    import yt_summarizer
+
+    auto_runner.LOG_FILE = os.path.join(work_dir, "auto.log")
+    auto_runner.FEED_STATE_FILE = os.path.join(work_dir, "feed_state.json")
+    auto_runner.PROCESSED_FILE = os.path.join(work_dir, "processed.json")
+    auto_runner.SCRIPT_DIR = work_dir
+    # 邮件发送到本地 SMTP 替身
+    auto_runner.EMAIL_SMTP_SERVER, auto_runner.EMAIL_SMTP_PORT = smtp_standin.host, smtp_standin.port
+    auto_runner.EMAIL_ADDRESS, auto_runner.EMAIL_PASSWORD = "bench@localhost", "bench"
+    auto_runner.EMAIL_DIGEST = args.digest
+    for cache in result_cache.CACHES.values():
+        cache.directory = os.path.join(work_dir, "cache", cache.name)
+
+    channels = [f"UCbench{index:017d}" for index in range(args.channels)]
+    with open(os.path.join(work_dir, "channels.json"), "w", encoding="utf-8") as f:
+        json.dump({"channels": channels}, f)
+    auto_runner.CHANNELS_FILE = os.path.join(work_dir, "channels.json")
+
+    # 视频信息和下载替换为本地假音频
+    audio_bytes = os.urandom(args.audio_kb * 1024)
+
+    # 视频信息与 feed 一致（同一频道的视频上传者相同、今天发布），文件夹由真实的
+    # get_video_info_and_create_folder 按 日期_频道名_视频ID 创建，覆盖同频道同日多个视频同时处理的情况
+    def fake_info(video_url):
+        video_id = yt_summarizer.extract_video_id(video_url)
+        return {
+            "id": video_id,
+            "title": f"Bench Channel {video_id[:4]} video {int(video_id[5:])}",
+            "uploader": f"Bench Channel {video_id[:4]}",
+            "upload_date": datetime.now(timezone.utc).strftime("%Y%m%d"),
+            "duration": args.audio_duration,
+        }
+
+    def fake_download(video_url, folder_path, max_retries=3):
+        time.sleep(args.download_latency)
+        audio_file = os.path.join(folder_path, "audio.webm")
+        with open(audio_file, "wb") as f:
+            f.write(audio_bytes)
+        return audio_file
+
+    yt_summarizer.get_video_info = fake_info
+    # 转录费用按音频时长估算，时长与假视频信息一致
+    yt_summarizer._video_duration = lambda video_url: args.audio_duration
+    yt_summarizer.download_audio = fake_download
+
+    # 包装 auto_runner 的各个步骤以记录耗时
+    samples = {"discovery_channel": [], "ledger_filter": [], "ledger_mark": []}
+    results = []
+    failures = []
+
+    def timed(name, func):
+        def wrapper(*a, **kw):
+            start = time.perf_counter()
+            try:
+                return func(*a, **kw)
+            finally:
+                samples[name].append(time.perf_counter() - start)
+        return wrapper
+
+    auto_runner.scan_channel_feed = timed("discovery_channel", auto_runner.scan_channel_feed)
+    auto_runner.filter_unprocessed_videos = timed("ledger_filter", auto_runner.filter_unprocessed_videos)
+    auto_runner.save_processed_video = timed("ledger_mark", auto_runner.save_processed_video)
+
+    handle_done, handle_error = auto_runner.handle_video_done, auto_runner.handle_video_error
+
+    def on_done(video_info, result):
+        results.append(result)
+        handle_done(video_info, result)
+
+    def on_error(video_info, error):
+        failures.append(str(error))
+        handle_error(video_info, error)
+
+    auto_runner.handle_video_done = on_done
+    auto_runner.handle_video_error = on_error
+
+    def run_once():
+        output = open(os.path.join(work_dir, "run.log"), "a", encoding="utf-8")
+        redirect = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(output)
+        start = time.perf_counter()
+        with redirect:
+            auto_runner.main()
+            auto_runner.close_processed_store()
+            auto_runner.close_job_queue()
+        output.close()
+        return time.perf_counter() - start
+
+    if args.warm:
+        # 先完整运行一次填充缓存，再换一个空的处理记录重新计时
+        run_once()
+        os.remove(os.environ["PROCESSED_STORE"])
+        os.remove(os.environ["JOB_QUEUE_DB"])
+        os.remove(os.environ["CHANNEL_SCHEDULE_FILE"])
+        auto_runner._scheduler = None
+        auto_runner._feed_cache.clear()
+        for name in samples:
+            samples[name].clear()
+        results.clear()
+        failures.clear()
+        smtp_standin.messages.clear()
+        smtp_standin.connections = 0
+
+    wall = run_once()
+
+    stages = {
+        "discovery_channel": summarize_latencies(samples["discovery_channel"]),
+        "ledger_filter": summarize_latencies(samples["ledger_filter"]),
+        "ledger_mark": summarize_latencies(samples["ledger_mark"]),
+    }
+    for stage in ("metadata", "download", "transcribe", "summarize_first_token", "summarize", "total"):
+        stages[stage] = summarize_latencies([r.timings[stage] for r in results if stage in r.timings])
+
+    costs = {}
+    for stage in ("transcribe", "summarize"):
+        values = [r.costs.get(stage, 0.0) for r in results]
+        costs[stage] = {"total": round(sum(values), 6), "per_video": round(sum(values) / len(values), 6) if values else 0}
+    costs["total"] = round(costs["transcribe"]["total"] + costs["summarize"]["total"], 6)
+
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "params": vars(args),
+        "videos_expected": args.channels * args.videos,
+        "videos_completed": len(results),
+        "videos_failed": len(failures),
+        "transcripts_cached": sum(1 for r in results if r.transcript_cached),
+        "wall_seconds": round(wall, 3),
+        "throughput_videos_per_min": round(len(results) / wall * 60, 2) if wall else 0,
+        "uploaded_mb": round(aai_server.uploaded_bytes / 1024 / 1024, 2),
+        "emails_received": len(smtp_standin.messages),
+        "smtp_connections": smtp_standin.connections,
+        "peak_rss_mb": peak_rss_mb(),
+        "providers": {"transcription": args.transcription_provider, "summary": args.summary_provider},
+        "costs_usd": costs,
+        "stages": stages,
+    }
+
+    feed_server.close()
+    aai_server.close()
+    smtp_standin.close()
+    return report
+
+
+def print_report(report):
+    print(f"📊 {report['videos_completed']}/{report['videos_expected']} 个视频完成"
+          f"（失败 {report['videos_failed']}，命中转录缓存 {report['transcripts_cached']}）")
+    print(f"⏱️ 总耗时 {report['wall_seconds']:.2f}s，吞吐量 {report['throughput_videos_per_min']:.1f} 视频/分钟，"
+          f"峰值内存 {report['peak_rss_mb']:.1f} MB")
+    print(f"📧 收到 {report['emails_received']} 封邮件，SMTP 连接 {report['smtp_connections']} 次")
+    costs = report["costs_usd"]
+    print(f"💰 估算费用 ${costs['total']:.4f}（转录 {report['providers']['transcription']} "
+          f"${costs['transcribe']['total']:.4f}，总结 {report['providers']['summary']} ${costs['summarize']['total']:.4f}）")
+    print("")
+    print(f"{'阶段':<24}{'次数':>6}{'p50(s)':>10}{'p90(s)':>10}{'p99(s)':>10}")
+    for stage, stats in report["stages"].items():
+        if stats["count"]:
+            print(f"{stage:<24}{stats['count']:>6}{stats['p50']:>10.3f}{stats['p90']:>10.3f}{stats['p99']:>10.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端流水线基准测试（全部使用本地替身）")
+    parser.add_argument("--channels", type=int, default=5, help="频道数 N")
+    parser.add_argument("--videos", type=int, default=4, help="每个频道今天发布的视频数 M")
+    parser.add_argument("--audio-kb", type=int, default=512, help="假音频文件大小（KB）")
+    parser.add_argument("--audio-duration", type=float, default=600, help="模拟的音频时长（秒）")
+    parser.add_argument("--transcript-words", type=int, default=1500, help="模拟转录文本的词数")
+    parser.add_argument("--feed-latency", type=float, default=0.05, help="feed 请求延迟（秒）")
+    parser.add_argument("--download-latency", type=float, default=0.2, help="下载延迟（秒）")
+    parser.add_argument("--transcribe-latency", type=float, default=1.0, help="转录任务完成所需时间（秒）")
+    parser.add_argument("--summary-latency", type=float, default=0.3, help="总结生成时间（秒）")
+    parser.add_argument("--smtp-latency", type=float, default=0.05, help="SMTP 每封邮件的处理延迟（秒）")
+    parser.add_argument("--digest", action="store_true", help="使用摘要邮件模式")
+    parser.add_argument("--download-workers", type=int, default=2, help="下载线程数")
+    parser.add_argument("--summarize-workers", type=int, default=2, help="总结线程数")
+    parser.add_argument("--transcription-provider", default="assemblyai", choices=["assemblyai", "whisper", "fake"],
+                        help="转录服务商（assemblyai 使用本地替身，whisper 会调用真实接口）")
+    parser.add_argument("--summary-provider", default="fake", choices=["fake", "gemini"],
+                        help="总结服务商（gemini 会调用真实接口）")
+    parser.add_argument("--warm", action="store_true", help="先运行一次填充缓存，测量缓存命中时的性能")
+    parser.add_argument("--output", default="pipeline_bench.json", help="结果 JSON 文件路径")
+    parser.add_argument("--verbose", action="store_true", help="输出流水线日志")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="yt-bench-")
+    try:
+        report = run_benchmark(args, work_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print_report(report)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\n📂 结果已保存到 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
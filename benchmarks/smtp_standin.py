@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+本地 SMTP 替身
+实现 EHLO / AUTH PLAIN / MAIL / RCPT / DATA / RSET / NOOP / QUIT 的最小子集（不支持 STARTTLS，
+mailer 需设置 EMAIL_SMTP_STARTTLS=0），接受任意账户密码，把收到的邮件保存在内存中。
+记录连接数和登录次数，便于确认一次运行只建立了一个连接
+
+用法:
+  python benchmarks/smtp_standin.py [端口]     # 前台运行并打印收到的邮件主题
+"""
+
+import socketserver
+import sys
+import threading
+from email import message_from_bytes
+from email.header import decode_header, make_header
+
+
+class SMTPStandin:
+    """在后台线程中运行的本地 SMTP 服务器"""
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, on_message=None):
+        self.messages = []      # [(发件人, [收件人], 原始邮件bytes)]
+        self.connections = 0
+        self.logins = 0
+        self.latency = latency  # 每封邮件 DATA 结束后的模拟处理延迟（秒）
+        self.on_message = on_message
+        self._lock = threading.Lock()
+        standin = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, line):
+                self.wfile.write((line + "\r\n").encode("ascii"))
+
+            def handle(self):
+                with standin._lock:
+                    standin.connections += 1
+                self.reply("220 localhost SMTP standin ready")
+                sender, recipients = None, []
+                while True:
+                    line = self.rfile.readline()
+                    if not line:
+                        return
+                    command = line.decode("utf-8", "replace").strip()
+                    verb = command.split(" ", 1)[0].upper()
+                    if verb in ("EHLO", "HELO"):
+                        self.reply("250-localhost")
+                        self.reply("250-AUTH PLAIN")
+                        self.reply("250 8BITMIME")
+                    elif verb == "AUTH":
+                        # 只支持 AUTH PLAIN；没有附带凭据时再读一行
+                        if len(command.split()) < 3:
+                            self.reply("334 ")
+                            self.rfile.readline()
+                        with standin._lock:
+                            standin.logins += 1
+                        self.reply("235 2.7.0 Authentication successful")
+                    elif verb == "MAIL":
+                        sender, recipients = command.split(":", 1)[1].strip(" <>"), []
+                        self.reply("250 OK")
+                    elif verb == "RCPT":
+                        recipients.append(command.split(":", 1)[1].strip(" <>"))
+                        self.reply("250 OK")
+                    elif verb == "DATA":
+                        self.reply("354 End data with <CR><LF>.<CR><LF>")
+                        lines = []
+                        while True:
+                            data = self.rfile.readline()
+                            if not data or data in (b".\r\n", b".\n"):
+                                break
+                            lines.append(data[1:] if data.startswith(b"..") else data)
+                        if standin.latency:
+                            threading.Event().wait(standin.latency)
+                        standin._received(sender, recipients, b"".join(lines))
+                        self.reply("250 OK queued")
+                    elif verb == "RSET":
+                        sender, recipients = None, []
+                        self.reply("250 OK")
+                    elif verb == "NOOP":
+                        self.reply("250 OK")
+                    elif verb == "QUIT":
+                        self.reply("221 Bye")
+                        return
+                    else:
+                        self.reply("502 Command not implemented")
+
+        class Server(socketserver.ThreadingTCPServer):
+            daemon_threads = True
+            allow_reuse_address = True
+
+        self.server = Server((host, port), Handler)
+        self.host, self.port = self.server.server_address
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def _received(self, sender, recipients, raw):
+        with self._lock:
+            self.messages.append((sender, recipients, raw))
+        if self.on_message:
+            self.on_message(sender, recipients, raw)
+
+    def subjects(self):
+        """已收到邮件的主题列表"""
+        with self._lock:
+            raws = [raw for _, _, raw in self.messages]
+        return [str(make_header(decode_header(message_from_bytes(raw)["Subject"] or ""))) for raw in raws]
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == "__main__":
+    def print_message(sender, recipients, raw):
+        subject = str(make_header(decode_header(message_from_bytes(raw)["Subject"] or "")))
+        print(f"📨 {sender} -> {', '.join(recipients)}: {subject} ({len(raw)} 字节)")
+
+    standin = SMTPStandin(port=int(sys.argv[1]) if len(sys.argv) > 1 else 1025, on_message=print_message)
+    print(f"📮 SMTP 替身运行在 {standin.host}:{standin.port}（EMAIL_SMTP_STARTTLS=0），按 Ctrl+C 退出")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        standin.close()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+按频道的发布规律安排feed检查时间
+  - 每个频道的发布历史来自feed中的发布时间，首次见到频道时用已处理记录中的发布日期补齐
+  - 由最近的发布间隔中位数估计下一次发布的时间：离预计发布还早时逐步拉长间隔，
+    临近预计时间时密集检查，长期没有发布的频道越来越少检查
+  - 每个频道的下次检查时间持久化到 channel_schedule.json（可通过环境变量 CHANNEL_SCHEDULE_FILE 指定），
+    cron 和常驻模式共用，未到检查时间的频道直接跳过
+"""
+
+import json
+import os
+import statistics
+import sys
+import threading
+from datetime import datetime, timedelta, timezone
+
+from file_utils import atomic_write_json
+from structured_log import get_logger
+
+logger = get_logger("channel_scheduler")
+
+# 获取脚本所在目录
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SCHEDULE_FILE = os.path.join(SCRIPT_DIR, "channel_schedule.json")
+
+# 单个频道两次检查的最短 / 最长间隔（秒）
+POLL_MIN_INTERVAL = float(os.getenv("CHANNEL_POLL_MIN_INTERVAL", "300"))
+POLL_MAX_INTERVAL = float(os.getenv("CHANNEL_POLL_MAX_INTERVAL", "21600"))
+# 临近预计发布时间时，平均每个发布间隔内检查几次
+POLL_CHECKS_PER_UPLOAD = float(os.getenv("CHANNEL_POLL_CHECKS_PER_UPLOAD", "12"))
+
+# 每个频道保留的发布记录条数（估计发布间隔只用最近的记录）
+HISTORY_SIZE = 50
+
+
+def _parse_time(value):
+    """解析ISO时间或日期字符串，统一为带时区的UTC时间"""
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def poll_interval(upload_times, now):
+    """
+    根据发布时间列表计算距离下次检查的秒数
+
+    典型间隔取最近发布间隔的中位数，临近预计发布时间时每 典型间隔/POLL_CHECKS_PER_UPLOAD 检查一次；
+    离预计发布还早时间隔取剩余时间的一半，已经逾期的按逾期程度放慢；
+    结果限制在 [POLL_MIN_INTERVAL, POLL_MAX_INTERVAL] 内，发布记录不足两条时取两者的几何平均
+    """
+    uploads = sorted(upload_times)
+    if len(uploads) < 2:
+        return (POLL_MIN_INTERVAL * POLL_MAX_INTERVAL) ** 0.5
+
+    gaps = [(later - earlier).total_seconds() for earlier, later in zip(uploads, uploads[1:])]
+    typical_gap = max(1.0, statistics.median(gaps[-HISTORY_SIZE:]))
+    interval = typical_gap / POLL_CHECKS_PER_UPLOAD
+
+    until_expected = (uploads[-1] - now).total_seconds() + typical_gap
+    if until_expected > interval:
+        interval = until_expected / 2
+    elif until_expected < 0:
+        interval *= 1 + (-until_expected) / typical_gap
+    return min(POLL_MAX_INTERVAL, max(POLL_MIN_INTERVAL, interval))
+
+
+class ChannelScheduler:
+    """各频道的发布历史和下次检查时间，线程安全；修改后需调用 save() 持久化"""
+
+    def __init__(self, path=None, ledger=None):
+        self.path = path or os.getenv("CHANNEL_SCHEDULE_FILE") or DEFAULT_SCHEDULE_FILE
+        self.ledger = ledger  # 已处理视频存储，用于补齐新频道的发布历史
+        self._lock = threading.Lock()
+        self._channels = {}
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._channels = json.load(f).get("channels", {})
+        except Exception as e:
+            logger.warning(f"⚠️ 加载频道检查计划失败，全部频道视为到期: {e}")
+
+    def _now(self, now):
+        return now or datetime.now(timezone.utc)
+
+    def next_check(self, channel_id):
+        """频道的下次检查时间，从未检查过的频道返回 None"""
+        with self._lock:
+            value = self._channels.get(channel_id, {}).get("next_check")
+        return _parse_time(value) if value else None
+
+    def due(self, channel_ids, now=None):
+        """返回已到检查时间的频道（保持输入顺序）"""
+        now = self._now(now)
+        return [channel_id for channel_id in channel_ids
+                if (self.next_check(channel_id) or now) <= now]
+
+    def seconds_until_next(self, channel_ids, now=None):
+        """距离这些频道中最早的下次检查还有多少秒（已到期时为 0）"""
+        now = self._now(now)
+        times = [self.next_check(channel_id) or now for channel_id in channel_ids]
+        if not times:
+            return None
+        return max(0.0, (min(times) - now).total_seconds())
+
+    def since(self, channel_id, default):
+        """
+        本次检查需要覆盖的最早发布日期：default 与上次检查日期中较早的一个，
+        保证两次检查之间发布的视频不会因为跳过了若干次检查而漏掉
+        """
+        with self._lock:
+            last_check = self._channels.get(channel_id, {}).get("last_check")
+        if not last_check:
+            return default
+        return min(default, _parse_time(last_check).date())
+
+    def record_check(self, channel_id, uploads=None, title=None, now=None):
+        """
+        记录一次成功的检查并安排下次检查，返回下次检查时间
+
+        uploads 为 feed 中的 {video_id: 发布时间}，feed 未更新（304）时为 None
+        """
+        now = self._now(now)
+        with self._lock:
+            state = self._channels.setdefault(channel_id, {"uploads": {}})
+            if title:
+                state["title"] = title
+            history = state.setdefault("uploads", {})
+            if not history and self.ledger is not None and state.get("title"):
+                try:
+                    history.update(self.ledger.channel_history(state["title"]))
+                except Exception as e:
+                    logger.warning(f"⚠️ 读取频道发布历史失败: {e}")
+            for video_id, published_at in (uploads or {}).items():
+                history[video_id] = published_at.isoformat()
+            if len(history) > HISTORY_SIZE:
+                recent = sorted(history.items(), key=lambda item: _parse_time(item[1]))[-HISTORY_SIZE:]
+                state["uploads"] = history = dict(recent)
+
+            next_check = now + timedelta(seconds=poll_interval([_parse_time(value) for value in history.values()], now))
+            state["last_check"] = now.isoformat(timespec="seconds")
+            state["next_check"] = next_check.isoformat(timespec="seconds")
+            return next_check
+
+    def record_failure(self, channel_id, now=None):
+        """检查失败时 POLL_MIN_INTERVAL 后重试（不更新上次检查时间）"""
+        now = self._now(now)
+        with self._lock:
+            state = self._channels.setdefault(channel_id, {"uploads": {}})
+            state["next_check"] = (now + timedelta(seconds=POLL_MIN_INTERVAL)).isoformat(timespec="seconds")
+
+    def save(self):
+        with self._lock:
+            atomic_write_json(self.path, {"channels": self._channels})
+
+
+if __name__ == "__main__":
+    # 用法: python channel_scheduler.py [channel_schedule.json]    列出各频道的检查计划
+    scheduler = ChannelScheduler(sys.argv[1] if len(sys.argv) > 1 else None)
+    now = datetime.now(timezone.utc)
+    print(f"🗓️ 共 {len(scheduler._channels)} 个频道")
+    for channel_id, state in sorted(scheduler._channels.items(), key=lambda item: item[1].get("next_check", "")):
+        uploads = sorted(_parse_time(value) for value in state.get("uploads", {}).values())
+        interval = poll_interval(uploads, now) / 3600
+        last_upload = uploads[-1].strftime("%Y-%m-%d %H:%M") if uploads else "-"
+        print(f"  {channel_id}  下次检查 {state.get('next_check', '-')}  当前间隔 {interval:.1f}h  "
+              f"最近发布 {last_upload}  {state.get('title', '')}")
@@ -0,0 +1,119 @@
+"""
+进程内共享的服务商客户端
+每种客户端在第一次使用时才创建，之后整个进程复用：
+  - HTTP（RSS 等）: 一个 requests.Session，连接池保持 keep-alive，避免每次请求重新握手TLS
+  - Gemini:        按 (模型, 生成参数) 缓存 GenerativeModel，genai.configure 只执行一次
+  - OpenAI:        一个 OpenAI 客户端，底层 httpx 连接池复用
+  - AssemblyAI:    绑定在后台事件循环上的 aiohttp 客户端（见 assemblyai_client）
+连接池大小通过 HTTP_POOL_CONNECTIONS / HTTP_POOL_MAXSIZE 配置
+
+各服务商的 SDK 只在创建对应客户端时才导入，API Key 也在那时才检查，
+因此 --help、命中缓存的运行和只操作记录的工具不需要加载 SDK，也不需要配置全部 Key
+"""
+
+import atexit
+import json
+import os
+import threading
+
+# 连接池配置：缓存的主机数、每个主机保持的连接数
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "10"))
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "20"))
+
+# 各服务商需要的 API Key：(环境变量名, 显示名称)
+API_KEYS = {
+    "gemini": ("GOOGLE_API_KEY", "Google"),
+    "openai": ("OPENAI_API_KEY", "OpenAI"),
+    "assemblyai": ("ASSEMBLYAI_API_KEY", "AssemblyAI"),
+}
+
+_lock = threading.RLock()  # 创建 Gemini 模型时会嵌套获取
+_clients = {}
+_genai = None
+
+
+def require_api_key(provider):
+    """返回服务商的 API Key，未设置时抛出 RuntimeError（在第一次使用该服务商时才检查）"""
+    env_name, label = API_KEYS[provider]
+    value = os.getenv(env_name)
+    if not value:
+        raise RuntimeError(f"未找到 {env_name} 环境变量，请在 .env 文件中设置您的 {label} API Key")
+    return value
+
+
+def _get_or_create(name, factory):
+    """按名称获取共享客户端，不存在时调用 factory() 创建"""
+    with _lock:
+        if name not in _clients:
+            _clients[name] = factory()
+        return _clients[name]
+
+
+def get_http_session():
+    """共享的 requests.Session（带连接池）"""
+    def create():
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+    return _get_or_create("http", create)
+
+
+def _get_genai():
+    """导入并配置 google.generativeai（只配置一次）"""
+    global _genai
+    with _lock:
+        if _genai is None:
+            import google.generativeai as genai
+
+            genai.configure(api_key=require_api_key("gemini"))
+            _genai = genai
+        return _genai
+
+
+def get_gemini_model(model_name, generation_config=None):
+    """共享的 Gemini GenerativeModel，相同模型和生成参数只创建一次"""
+    def create():
+        return _get_genai().GenerativeModel(model_name, generation_config=generation_config or None)
+    key = "gemini:" + model_name + ":" + json.dumps(generation_config or {}, sort_keys=True)
+    return _get_or_create(key, create)
+
+
+def get_openai_client():
+    """共享的 OpenAI 客户端"""
+    def create():
+        api_key = require_api_key("openai")
+        import httpx
+        import openai
+
+        limits = httpx.Limits(max_connections=HTTP_POOL_MAXSIZE, max_keepalive_connections=HTTP_POOL_CONNECTIONS)
+        return openai.OpenAI(api_key=api_key, http_client=httpx.Client(limits=limits))
+    return _get_or_create("openai", create)
+
+
+def get_assemblyai_client():
+    """共享的 AssemblyAI 客户端（只能在 assemblyai_client 的后台事件循环中使用）"""
+    from assemblyai_client import get_assemblyai_client as get_client
+
+    return get_client(require_api_key("assemblyai"))
+
+
+def close_clients():
+    """关闭所有共享客户端的连接池（进程退出时自动调用）"""
+    with _lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        close = getattr(client, "close", None)
+        if callable(close):
+            try:
+                close()
+            except Exception:
+                pass
+
+
+atexit.register(close_clients)
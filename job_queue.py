@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+持久化的视频任务队列
+记录每个视频处理到了哪个阶段，运行被中断（进程被杀、超时）后，下次运行从最后完成的阶段继续：
+  discovered -> downloaded -> uploaded -> transcript_created -> transcribed -> summarized -> emailed
+例如已经创建了转录任务的视频会直接轮询原来的 transcript_id，而不是重新下载、上传和转录
+
+存储为 SQLite（默认 jobs.db，可通过环境变量 JOB_QUEUE_DB 指定），每次状态变化立即提交
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+
+# 获取脚本所在目录
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_QUEUE_PATH = os.path.join(SCRIPT_DIR, "jobs.db")
+
+# 阶段顺序，状态只会向后推进
+STAGES = ("discovered", "downloaded", "uploaded", "transcript_created", "transcribed", "summarized", "emailed")
+
+# 断点续传时可以一并记录的字段
+CHECKPOINT_FIELDS = ("folder", "audio_file", "upload_url", "transcript_id")
+
+# 同一个视频最多尝试处理的次数，超过后不再自动恢复
+MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+
+@dataclass
+class Job:
+    """一个视频的处理状态"""
+    video_id: str
+    video_info: dict
+    stage: str
+    folder: str = None
+    audio_file: str = None
+    upload_url: str = None
+    transcript_id: str = None
+    attempts: int = 0
+    error: str = None
+    finished_at: str = None
+
+    def reached(self, stage):
+        """是否已完成 stage 阶段"""
+        return STAGES.index(self.stage) >= STAGES.index(stage)
+
+
+class JobQueue:
+    """基于 SQLite 的任务队列，线程安全"""
+
+    def __init__(self, path=None):
+        self.path = path or os.getenv("JOB_QUEUE_DB") or DEFAULT_QUEUE_PATH
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    video_id      TEXT PRIMARY KEY,
+                    video_info    TEXT NOT NULL,
+                    stage         TEXT NOT NULL,
+                    folder        TEXT,
+                    audio_file    TEXT,
+                    upload_url    TEXT,
+                    transcript_id TEXT,
+                    attempts      INTEGER NOT NULL DEFAULT 0,
+                    error         TEXT,
+                    created_at    TEXT NOT NULL,
+                    updated_at    TEXT NOT NULL,
+                    finished_at   TEXT
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_unfinished ON jobs (finished_at, created_at)")
+
+    @staticmethod
+    def _now():
+        return datetime.now().isoformat(timespec="seconds")
+
+    @staticmethod
+    def _to_job(row):
+        return Job(
+            video_id=row["video_id"],
+            video_info=json.loads(row["video_info"]),
+            stage=row["stage"],
+            folder=row["folder"],
+            audio_file=row["audio_file"],
+            upload_url=row["upload_url"],
+            transcript_id=row["transcript_id"],
+            attempts=row["attempts"],
+            error=row["error"],
+            finished_at=row["finished_at"],
+        )
+
+    def enqueue(self, video_info):
+        """登记新发现的视频（已存在则保持原状态），返回是否为新任务"""
+        now = self._now()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO jobs (video_id, video_info, stage, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (video_info["id"], json.dumps(video_info, ensure_ascii=False, default=str), STAGES[0], now, now)
+            )
+            return cursor.rowcount > 0
+
+    def get(self, video_id):
+        """返回任务状态，不存在时返回 None"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE video_id = ?", (video_id,)).fetchone()
+        return self._to_job(row) if row else None
+
+    def advance(self, video_id, stage, **fields):
+        """
+        记录视频完成了 stage 阶段，并保存断点字段（folder / audio_file / upload_url / transcript_id）
+
+        阶段只会向后推进：边下载边上传时 uploaded 可能先于 downloaded 记录，此时不会回退
+        """
+        unknown = set(fields) - set(CHECKPOINT_FIELDS)
+        if unknown:
+            raise ValueError(f"未知的任务字段: {', '.join(sorted(unknown))}")
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT stage FROM jobs WHERE video_id = ?", (video_id,)).fetchone()
+            if row is None:
+                return
+            if STAGES.index(stage) > STAGES.index(row["stage"]):
+                fields["stage"] = stage
+            fields["error"] = None
+            fields["updated_at"] = self._now()
+            assignments = ", ".join(f"{name} = ?" for name in fields)
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE video_id = ?", (*fields.values(), video_id))
+
+    def record_error(self, video_id, error):
+        """记录失败原因（阶段保持不变，下次运行从该阶段重试）"""
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE jobs SET error = ?, updated_at = ? WHERE video_id = ?",
+                               (str(error), self._now(), video_id))
+
+    def start_attempt(self, video_id):
+        """开始一次处理尝试，返回累计尝试次数"""
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE jobs SET attempts = attempts + 1, updated_at = ? WHERE video_id = ?",
+                               (self._now(), video_id))
+            row = self._conn.execute("SELECT attempts FROM jobs WHERE video_id = ?", (video_id,)).fetchone()
+            return row["attempts"] if row else 0
+
+    def finish(self, video_id, error=None):
+        """标记任务结束（完成或放弃），之后不再恢复"""
+        with self._lock, self._conn:
+            now = self._now()
+            if error is None:
+                self._conn.execute("UPDATE jobs SET finished_at = ?, updated_at = ? WHERE video_id = ?",
+                                   (now, now, video_id))
+            else:
+                self._conn.execute("UPDATE jobs SET finished_at = ?, updated_at = ?, error = ? WHERE video_id = ?",
+                                   (now, now, str(error), video_id))
+
+    def pending(self):
+        """所有未结束的任务，按登记时间排序"""
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM jobs WHERE finished_at IS NULL ORDER BY created_at").fetchall()
+        return [self._to_job(row) for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+if __name__ == "__main__":
+    # 用法: python job_queue.py [jobs.db]    列出未结束的任务
+    queue = JobQueue(sys.argv[1] if len(sys.argv) > 1 else None)
+    jobs = queue.pending()
+    print(f"📋 未结束的任务: {len(jobs)} 个")
+    for job in jobs:
+        error = f"  ❌ {job.error}" if job.error else ""
+        print(f"  {job.video_id}  {job.stage:<18} 尝试 {job.attempts} 次  {job.video_info.get('title', '')}{error}")
+    queue.close()
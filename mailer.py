@@ -0,0 +1,147 @@
+"""
+邮件发送
+  - 整个运行期间复用一个已登录的 SMTP 连接（只做一次 STARTTLS 和登录），连接断开时自动重连
+  - 邮件放入队列由后台线程依次发送，调用方不会被网络阻塞
+close() 会等待队列中的邮件全部发送完毕再断开连接
+"""
+
+import contextvars
+import os
+import queue
+import smtplib
+import threading
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from structured_log import span
+
+# 是否在登录前执行 STARTTLS（本地测试用的 SMTP 替身不支持 TLS 时设为 0）
+EMAIL_SMTP_STARTTLS = os.getenv("EMAIL_SMTP_STARTTLS", "1") == "1"
+
+# 连接类错误的重试次数和重试间隔（秒，按次数递增）
+SEND_RETRIES = 3
+RETRY_DELAY = 2
+
+
+def build_message(sender, recipient, subject, body):
+    """创建纯文本邮件"""
+    msg = MIMEMultipart()
+    msg['From'] = sender
+    msg['To'] = recipient
+    msg['Subject'] = subject
+    msg.attach(MIMEText(body, 'plain', 'utf-8'))
+    return msg
+
+
+def _is_transient(error):
+    """连接断开、网络错误或 4xx 临时错误，重新连接后可以重试"""
+    if isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+        return True
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return bool(error.recipients) and all(400 <= code < 500 for code, _ in error.recipients.values())
+    # SMTPException 是 OSError 的子类，其余 SMTP 错误（如 SMTPNotSupportedError）重试也不会成功
+    if isinstance(error, smtplib.SMTPException):
+        return False
+    return isinstance(error, OSError)
+
+
+class Mailer:
+    """复用一个 SMTP 连接、通过后台队列发送邮件"""
+
+    def __init__(self, server, port, address, password, starttls=EMAIL_SMTP_STARTTLS, on_result=None):
+        self.server = server
+        self.port = port
+        self.address = address
+        self.password = password
+        self.starttls = starttls
+        self.on_result = on_result  # 每封邮件发送结束后调用 on_result(label, error)，成功时 error 为 None
+        self._smtp = None
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.sent_count = 0
+
+    def _connect(self):
+        smtp = smtplib.SMTP(self.server, self.port, timeout=30)
+        try:
+            if self.starttls:
+                smtp.starttls()
+            if self.password:
+                smtp.login(self.address, self.password)
+        except BaseException:
+            smtp.close()
+            raise
+        self._smtp = smtp
+
+    def _disconnect(self, quit=False):
+        if self._smtp is None:
+            return
+        try:
+            if quit:
+                self._smtp.quit()
+            else:
+                self._smtp.close()
+        except Exception:
+            pass
+        self._smtp = None
+
+    def send_now(self, msg):
+        """在当前线程中立即发送，连接断开或临时错误时重新连接并重试"""
+        for attempt in range(1, SEND_RETRIES + 1):
+            try:
+                if self._smtp is None:
+                    self._connect()
+                self._smtp.sendmail(self.address, msg['To'], msg.as_string())
+                self.sent_count += 1
+                return
+            except Exception as e:
+                if not _is_transient(e):
+                    raise
+                self._disconnect()
+                if attempt >= SEND_RETRIES:
+                    raise
+                time.sleep(RETRY_DELAY * attempt)
+
+    def send(self, msg, label=None, on_done=None):
+        """把邮件放入发送队列后立即返回；on_done(error) 在这封邮件发送结束后调用，成功时 error 为 None"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._worker, name="mailer", daemon=True)
+                self._thread.start()
+        # 在调用方的日志上下文中发送，发送耗时的记录带上对应的视频ID
+        self._queue.put((msg, label or msg['Subject'], on_done, contextvars.copy_context()))
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            msg, label, on_done, context = item
+            context.run(self._deliver, msg, label, on_done)
+        self._disconnect(quit=True)
+
+    def _deliver(self, msg, label, on_done):
+        error = None
+        try:
+            with span("email", label=label):
+                self.send_now(msg)
+        except Exception as e:
+            error = e
+        for callback, args in ((self.on_result, (label, error)), (on_done, (error,))):
+            if callback:
+                try:
+                    callback(*args)
+                except Exception:
+                    pass
+
+    def close(self):
+        """等待队列中的邮件发送完毕并断开连接"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+        self._disconnect(quit=True)
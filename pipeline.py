@@ -0,0 +1,245 @@
+"""
+分阶段并行处理流水线
+  - download:   yt-dlp 下载和 ffmpeg 转码（I/O + CPU），独立线程池
+  - transcribe: 远程转录，大部分时间在等待，所有任务在共享的 asyncio 事件循环中并发执行，
+                并发上限由 ASSEMBLYAI_MAX_JOBS 控制
+  - summarize:  受服务商速率限制的 LLM 调用（限流在每次实际调用模型时进行），独立线程池
+一个视频完成某阶段后立即进入下一阶段的队列，因此一个视频在转录时下一个视频已经开始下载
+
+run_pipeline 处理一批视频后返回；常驻模式使用长期存在的 Pipeline，随时 submit 新发现的视频
+
+传入 job_queue.JobQueue 时，每个阶段完成后都会记录断点，之前中断的视频从最后完成的阶段继续
+（复用已下载的音频、已上传的 upload_url 或直接轮询已创建的 transcript_id）
+"""
+
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+
+from assemblyai_client import run_coroutine
+from providers import get_transcription_provider
+from rate_limit import get_rate_limiter
+from structured_log import get_logger, video_context
+from yt_summarizer import download_stage, resume_stage, transcribe_stage_async, summarize_stage, terminate_downloads
+
+# 各阶段并发数
+DOWNLOAD_WORKERS = int(os.getenv("PIPELINE_DOWNLOAD_WORKERS", "2"))
+SUMMARIZE_WORKERS = int(os.getenv("PIPELINE_SUMMARIZE_WORKERS", "2"))
+
+logger = get_logger("pipeline")
+
+
+@dataclass(eq=False)
+class _Task:
+    """流水线中的一个视频（按对象比较，不比较字段）"""
+    video: dict
+    future: Future = field(default_factory=Future)  # 结束时结果为 SummaryResult 或 Exception
+    started: bool = False                           # 是否已开始下载阶段
+    finished: bool = False
+
+
+class Pipeline:
+    """
+    长期运行的分阶段流水线，submit() 的视频立即进入下载队列，各阶段的线程池在 close() 之前一直保留
+
+    Args:
+        on_complete (callable): 每个视频完成时调用 on_complete(video_info, result)
+        on_error (callable): 某个视频在任一阶段失败时调用 on_error(video_info, exception)
+        base_dir (str): 输出文件夹所在目录
+        on_summary_chunk (callable): 流式生成总结时每收到一段文本调用 on_summary_chunk(video_info, 文本)
+        jobs (JobQueue): 记录各阶段断点的任务队列（视频信息需包含 id），为 None 时不记录
+    """
+
+    def __init__(self, on_complete=None, on_error=None, base_dir=None, on_summary_chunk=None, jobs=None):
+        self.on_complete = on_complete
+        self.on_error = on_error
+        self.base_dir = base_dir
+        self.on_summary_chunk = on_summary_chunk
+        self.jobs = jobs
+        self._tasks = []
+        self._done = threading.Condition()
+        self._download_pool = ThreadPoolExecutor(max_workers=max(1, DOWNLOAD_WORKERS), thread_name_prefix="download")
+        self._summarize_pool = ThreadPoolExecutor(max_workers=max(1, SUMMARIZE_WORKERS), thread_name_prefix="summarize")
+
+    def submit(self, video_info):
+        """加入一个视频，返回在该视频结束时完成的 Future（结果为 SummaryResult 或 Exception）"""
+        task = _Task(video_info)
+        with self._done:
+            self._tasks.append(task)
+        self._download_pool.submit(self._download, task)
+        return task.future
+
+    def in_flight(self):
+        """正在处理中的视频ID"""
+        with self._done:
+            return {task.video.get("id") for task in self._tasks}
+
+    def close(self, wait=True):
+        """
+        停止接收新视频并丢弃尚未开始下载的视频（它们仍留在任务队列中，下次运行继续）
+
+        wait 为 True 时等待已开始的视频全部处理结束；为 False 时（强制退出）结束正在运行的 yt-dlp 进程，
+        不等待进行中的下载、转录和总结
+        """
+        if not wait:
+            terminate_downloads()
+        # 按阶段顺序关闭，保证上游提交到下游的任务不会被拒绝
+        self._download_pool.shutdown(wait=wait, cancel_futures=True)
+        with self._done:
+            for task in [task for task in self._tasks if not task.started]:
+                self._tasks.remove(task)
+                task.future.cancel()
+            if wait:
+                self._done.wait_for(lambda: not self._tasks)
+        self._summarize_pool.shutdown(wait=wait, cancel_futures=True)
+
+    def _checkpoint(self, task, stage, **fields):
+        video_id = task.video.get("id")
+        if self.jobs is not None and video_id:
+            self.jobs.advance(video_id, stage, **fields)
+
+    def _finish(self, task, outcome):
+        """记录视频的最终结果，每个视频只生效一次（之后的调用只记录日志）"""
+        video_info = task.video
+        with self._done:
+            if task.finished:
+                if isinstance(outcome, Exception):
+                    logger.error(f"❌ 视频处理收尾异常: {video_info.get('title', video_info['url'])}, 错误: {outcome}")
+                return
+            task.finished = True
+        try:
+            if self.jobs is not None and video_info.get("id"):
+                try:
+                    if isinstance(outcome, Exception):
+                        self.jobs.record_error(video_info["id"], outcome)
+                    elif outcome.error:
+                        self.jobs.record_error(video_info["id"], outcome.error)
+                    else:
+                        self.jobs.advance(video_info["id"], "summarized")
+                except Exception as e:
+                    logger.error(f"❌ 记录任务状态失败: {e}")
+            if isinstance(outcome, Exception):
+                if self.on_error:
+                    self.on_error(video_info, outcome)
+            elif self.on_complete:
+                self.on_complete(video_info, outcome)
+        finally:
+            with self._done:
+                if task in self._tasks:
+                    self._tasks.remove(task)
+                self._done.notify_all()
+            if not task.future.cancelled():
+                task.future.set_result(outcome)
+
+    def _resume(self, task):
+        """从任务队列记录的断点继续，返回是否已接手该视频"""
+        job = self.jobs.get(task.video.get("id")) if self.jobs is not None else None
+        if not job or not job.reached("downloaded") or not job.folder or not os.path.isdir(job.folder):
+            return False
+        # 旧版按“日期_频道名”命名的文件夹由同频道同日的视频共用，其中的音频和转录不一定属于该视频，重新处理
+        if not os.path.basename(os.path.normpath(job.folder)).endswith(f"_{job.video_id}"):
+            return False
+        result = resume_stage(task.video["url"], job.folder, job.audio_file)
+        if result.transcript is not None:
+            logger.info(f"♻️ 从 {job.stage} 阶段恢复，直接生成总结: {job.folder}")
+            self._summarize_pool.submit(self._summarize, task, result, result.transcript)
+            return True
+        if result.audio_file or job.transcript_id:
+            logger.info(f"♻️ 从 {job.stage} 阶段恢复，跳过下载: {job.folder}")
+            self._start_transcription(task, result,
+                                      resume={"upload_url": job.upload_url, "transcript_id": job.transcript_id})
+            return True
+        return False
+
+    # 各阶段在对应视频的日志上下文中运行（转录协程由下载线程创建，自动继承），日志都带上视频ID；
+    # 任何未处理的异常（读取断点、写任务队列失败等）都结束该视频，否则等待它的调用方会一直等下去
+    def _download(self, task):
+        task.started = True
+        with video_context(task.video.get("id")):
+            try:
+                self._download_body(task)
+            except Exception as e:
+                self._finish(task, e)
+
+    def _download_body(self, task):
+        if self._resume(task):
+            return
+
+        # 边下载边上传时，转录在下载过程中就已开始，失败由转录阶段统一上报
+        streaming = []
+
+        def on_audio_started(result, download_future):
+            self._start_transcription(task, result, download_future)
+            streaming.append(True)
+
+        try:
+            result = download_stage(task.video["url"], self.base_dir, on_audio_started)
+        except Exception as e:
+            if not streaming:
+                self._finish(task, e)
+            return
+        self._checkpoint(task, "transcribed" if result.transcript_cached else "downloaded",
+                         folder=result.folder, audio_file=result.audio_file)
+        if result.transcript_cached:
+            self._summarize_pool.submit(self._summarize, task, result, result.transcript)
+        elif not streaming:
+            self._start_transcription(task, result)
+
+    def _start_transcription(self, task, result, download_future=None, resume=None):
+        on_progress = lambda stage, **fields: self._checkpoint(task, stage, **fields)
+        future = run_coroutine(self._transcribe(result, download_future, resume, on_progress))
+        future.add_done_callback(lambda f: self._transcribed(task, result, f))
+
+    async def _transcribe(self, result, download_future, resume, on_progress):
+        # 继续等待已创建的转录任务不会产生新的请求，不占用限流配额
+        if not (resume and resume.get("transcript_id")):
+            await get_rate_limiter(get_transcription_provider().name).acquire_async()
+        return await transcribe_stage_async(result, download_future, resume, on_progress)
+
+    def _transcribed(self, task, result, future):
+        with video_context(task.video.get("id")):
+            try:
+                try:
+                    text = future.result()
+                except Exception as e:
+                    self._finish(task, e)
+                    return
+                self._checkpoint(task, "transcribed")
+                self._summarize_pool.submit(self._summarize, task, result, text)
+            except Exception as e:
+                self._finish(task, e)
+
+    def _summarize(self, task, result, text):
+        with video_context(task.video.get("id")):
+            try:
+                on_chunk = None
+                if self.on_summary_chunk:
+                    on_chunk = lambda piece: self.on_summary_chunk(task.video, piece)
+                outcome = summarize_stage(result, text, on_chunk)
+            except Exception as e:
+                outcome = e
+            self._finish(task, outcome)
+
+
+def run_pipeline(videos, on_complete=None, on_error=None, base_dir=None, on_summary_chunk=None, jobs=None):
+    """
+    并行处理一批视频，所有视频处理结束后返回（参数含义同 Pipeline）
+
+    Returns:
+        list: 与 videos 顺序一致的 (video_info, SummaryResult 或 Exception) 列表
+    """
+    if not videos:
+        return []
+
+    pipeline = Pipeline(on_complete, on_error, base_dir, on_summary_chunk, jobs)
+    finished = False
+    try:
+        futures = [pipeline.submit(video) for video in videos]
+        wait(futures)
+        finished = True
+    finally:
+        # 中断时丢弃尚未开始的视频，不等待进行中的转录
+        pipeline.close(wait=finished)
+
+    return [(video, future.result()) for video, future in zip(videos, futures)]
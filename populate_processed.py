@@ -1,12 +1,12 @@
 #!/usr/bin/env python3
 """
-填充现有视频到processed.json
+填充现有视频到已处理视频存储
 """
 
 import os
 import re
-import json
-from datetime import datetime
+
+from processed_store import open_processed_store
 
 # 获取当前目录下的所有视频文件夹
 def get_existing_video_folders():
@@ -22,13 +22,16 @@ def get_existing_video_folders():
 
 def extract_video_info_from_folder(folder_name):
     """从文件夹名称提取视频信息"""
-    # 文件夹格式：MMDD_频道名称
-    parts = folder_name.split('_', 1)
-    if len(parts) != 2:
-        return None
-    
-    date_part = parts[0]
-    channel_name = parts[1]
+    # 文件夹格式：MMDD_频道名称_视频ID（旧版没有视频ID：MMDD_频道名称）
+    match = re.match(r'(\d{4})_(.+)_([A-Za-z0-9_-]{11})$', folder_name)
+    if match:
+        date_part, channel_name, video_id = match.groups()
+    else:
+        parts = folder_name.split('_', 1)
+        if len(parts) != 2:
+            return None
+        date_part, channel_name = parts
+        video_id = None
     
     # 假设年份为2025年（根据实际情况调整）
     try:
@@ -40,23 +43,18 @@ def extract_video_info_from_folder(folder_name):
     
     return {
         'channel_name': channel_name,
-        'published_date': published_date
+        'published_date': published_date,
+        'video_id': video_id
     }
 
 def populate_processed_videos():
     """填充已处理的视频记录"""
-    print("🔄 填充现有视频到processed.json")
+    print("🔄 填充现有视频到已处理视频存储")
     print("=" * 40)
     
-    # 加载现有的processed.json
-    processed_file = "processed.json"
-    if os.path.exists(processed_file):
-        with open(processed_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-    else:
-        data = {"processed_videos": {}}
-    
-    processed_videos = data["processed_videos"]
+    # 打开已处理视频存储
+    store = open_processed_store()
+    new_records = {}
     
     # 获取现有文件夹
     folders = get_existing_video_folders()
@@ -87,12 +85,12 @@ def populate_processed_videos():
             # 尝试从文件夹中的内容推断标题（简化处理）
             video_title = f"视频来自 {info['channel_name']} - {info['published_date']}"
             
-            # 生成一个唯一ID（基于文件夹名）
-            video_id = folder.replace('_', '-')
+            # 使用文件夹名中的视频ID，旧版文件夹没有时基于文件夹名生成一个唯一ID
+            video_id = info['video_id'] or folder.replace('_', '-')
             
             # 如果还没有记录这个视频
-            if video_id not in processed_videos:
-                processed_videos[video_id] = {
+            if video_id not in new_records and not store.is_processed(video_id):
+                new_records[video_id] = {
                     "title": video_title,
                     "url": f"https://youtube.com/watch?v={video_id}",  # 占位符URL
                     "channel": info['channel_name'],
@@ -109,15 +107,16 @@ def populate_processed_videos():
         except Exception as e:
             print(f"  ❌ 处理异常: {e}")
     
-    # 保存更新的记录
+    # 一次性写入新增的记录
     if added_count > 0:
-        with open(processed_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        store.add_many(new_records)
         
         print(f"\n✅ 成功添加 {added_count} 个视频记录")
-        print(f"📋 总共记录了 {len(processed_videos)} 个已处理视频")
+        print(f"📋 总共记录了 {store.count()} 个已处理视频")
     else:
-        print(f"\n✅ 没有新增记录，总共 {len(processed_videos)} 个已处理视频")
+        print(f"\n✅ 没有新增记录，总共 {store.count()} 个已处理视频")
+    
+    store.close()
 
 if __name__ == "__main__":
     populate_processed_videos()
\ No newline at end of file
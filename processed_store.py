@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+已处理视频记录存储
+提供可替换的存储后端：
+  - SqliteProcessedStore: 默认后端，按视频ID建索引，每次持久化是一个事务
+  - JsonProcessedStore:   兼容旧版 processed.json 的后端，加文件锁并原子替换写入
+
+mark_processed 的记录先放在内存缓冲区中，每累计 flush_every 条统一持久化一次，
+调用方在运行结束时需要调用 flush() 或 close()。
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+
+from file_utils import atomic_write_json, file_lock
+
+# 获取脚本所在目录
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 默认存储位置，可通过环境变量 PROCESSED_STORE 指定（.db 使用SQLite，.json 使用旧格式）
+DEFAULT_STORE_PATH = os.path.join(SCRIPT_DIR, "processed.db")
+LEGACY_JSON_PATH = os.path.join(SCRIPT_DIR, "processed.json")
+
+# 每累计多少条完成记录做一次持久化
+DEFAULT_FLUSH_EVERY = int(os.getenv("PROCESSED_FLUSH_EVERY", "5"))
+
+# SQLite 的 IN 查询每批最多携带的参数数量
+_QUERY_BATCH_SIZE = 500
+
+
+class ProcessedStore:
+    """已处理视频存储接口，子类实现 _filter_stored / _write_records 等持久化细节"""
+
+    def __init__(self, flush_every=DEFAULT_FLUSH_EVERY):
+        self.flush_every = max(1, flush_every)
+        self._lock = threading.RLock()
+        self._pending = {}
+
+    def is_processed(self, video_id):
+        """检查单个视频是否已处理"""
+        return not self.filter_unprocessed([video_id])
+
+    def filter_unprocessed(self, video_ids):
+        """批量过滤，返回尚未处理的视频ID（保持输入顺序）"""
+        with self._lock:
+            video_ids = [video_id for video_id in video_ids if video_id not in self._pending]
+            return self._filter_stored(video_ids)
+
+    def mark_processed(self, video_id, record):
+        """记录一个已处理视频（已存在则覆盖），缓冲区满时自动持久化"""
+        with self._lock:
+            self._pending[video_id] = record
+            if len(self._pending) >= self.flush_every:
+                self.flush()
+
+    def flush(self):
+        """把缓冲区中的记录一次性持久化"""
+        with self._lock:
+            if self._pending:
+                self._write_records(self._pending, overwrite=True)
+                self._pending = {}
+
+    def add_many(self, records, overwrite=False):
+        """批量直接写入记录，默认不覆盖已存在的视频ID，返回写入数量"""
+        with self._lock:
+            return self._write_records(records, overwrite)
+
+    def count(self):
+        """已处理视频总数"""
+        with self._lock:
+            self.flush()
+            return self._count_stored()
+
+    def channel_history(self, channel):
+        """某个频道（按频道名称）已处理视频的发布日期 {video_id: published}"""
+        with self._lock:
+            self.flush()
+            return self._channel_stored(channel)
+
+    def close(self):
+        self.flush()
+
+    def _filter_stored(self, video_ids):
+        raise NotImplementedError
+
+    def _channel_stored(self, channel):
+        raise NotImplementedError
+
+    def _write_records(self, records, overwrite):
+        raise NotImplementedError
+
+    def _count_stored(self):
+        raise NotImplementedError
+
+
+class SqliteProcessedStore(ProcessedStore):
+    """基于SQLite的存储，查询走主键索引，每次持久化是一个事务"""
+
+    def __init__(self, path, flush_every=DEFAULT_FLUSH_EVERY):
+        super().__init__(flush_every)
+        self.path = path
+        # 多个进程同时写时等待对方事务结束，而不是立即报错
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS processed_videos (
+                    video_id     TEXT PRIMARY KEY,
+                    channel      TEXT,
+                    published    TEXT,
+                    processed_at TEXT,
+                    record       TEXT NOT NULL
+                )
+            """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_processed_channel ON processed_videos (channel, published)"
+            )
+
+    def _filter_stored(self, video_ids):
+        found = set()
+        for start in range(0, len(video_ids), _QUERY_BATCH_SIZE):
+            batch = video_ids[start:start + _QUERY_BATCH_SIZE]
+            placeholders = ",".join("?" * len(batch))
+            rows = self._conn.execute(
+                f"SELECT video_id FROM processed_videos WHERE video_id IN ({placeholders})", batch
+            )
+            found.update(row[0] for row in rows)
+        return [video_id for video_id in video_ids if video_id not in found]
+
+    def _write_records(self, records, overwrite):
+        rows = [
+            (video_id, record.get("channel"), record.get("published"), record.get("processed_at"),
+             json.dumps(record, ensure_ascii=False))
+            for video_id, record in records.items()
+        ]
+        conflict = "REPLACE" if overwrite else "IGNORE"
+        with self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                f"INSERT OR {conflict} INTO processed_videos "
+                "(video_id, channel, published, processed_at, record) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            return self._conn.total_changes - before
+
+    def _count_stored(self):
+        return self._conn.execute("SELECT COUNT(*) FROM processed_videos").fetchone()[0]
+
+    def _channel_stored(self, channel):
+        rows = self._conn.execute(
+            "SELECT video_id, published FROM processed_videos WHERE channel = ? AND published IS NOT NULL", (channel,)
+        ).fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self._lock:
+            self.flush()
+            self._conn.close()
+
+
+class JsonProcessedStore(ProcessedStore):
+    """旧版 processed.json 后端，启动时读取一次并在内存中建立索引"""
+
+    def __init__(self, path, flush_every=DEFAULT_FLUSH_EVERY):
+        super().__init__(flush_every)
+        self.path = path
+        self._records = self._read()
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            return json.load(f).get("processed_videos", {})
+
+    def _filter_stored(self, video_ids):
+        return [video_id for video_id in video_ids if video_id not in self._records]
+
+    def _write_records(self, records, overwrite):
+        # 加锁后重新读取磁盘上的最新内容再合并，避免覆盖其他进程刚写入的记录
+        with file_lock(self.path):
+            merged = self._read()
+            written = 0
+            for video_id, record in records.items():
+                if overwrite or video_id not in merged:
+                    merged[video_id] = record
+                    written += 1
+            if written:
+                atomic_write_json(self.path, {"processed_videos": merged})
+            self._records = merged
+            return written
+
+    def _count_stored(self):
+        return len(self._records)
+
+    def _channel_stored(self, channel):
+        return {video_id: record.get("published") for video_id, record in self._records.items()
+                if record.get("channel") == channel and record.get("published")}
+
+
+def open_processed_store(path=None, legacy_json=LEGACY_JSON_PATH, flush_every=DEFAULT_FLUSH_EVERY):
+    """按文件扩展名打开对应的存储后端；新建SQLite存储时自动导入旧版processed.json"""
+    path = path or os.getenv("PROCESSED_STORE") or DEFAULT_STORE_PATH
+    if path.endswith(".json"):
+        store = JsonProcessedStore(path, flush_every)
+        store.migrated_count = 0
+        return store
+
+    is_new = not os.path.exists(path)
+    store = SqliteProcessedStore(path, flush_every)
+    store.migrated_count = migrate_from_json(store, legacy_json) if is_new and legacy_json else 0
+    return store
+
+
+def migrate_from_json(store, json_path=LEGACY_JSON_PATH):
+    """把旧版 processed.json 中的记录导入到存储中，返回新增数量"""
+    if not os.path.exists(json_path) or os.path.abspath(json_path) == os.path.abspath(getattr(store, "path", "")):
+        return 0
+    with open(json_path, "r", encoding="utf-8") as f:
+        records = json.load(f).get("processed_videos", {})
+    return store.add_many(records)
+
+
+if __name__ == "__main__":
+    # 用法: python processed_store.py migrate [processed.json] [processed.db]
+    if len(sys.argv) < 2 or sys.argv[1] != "migrate":
+        print("使用方法:")
+        print("  python processed_store.py migrate [processed.json路径] [目标存储路径]")
+        sys.exit(1)
+
+    source = sys.argv[2] if len(sys.argv) > 2 else LEGACY_JSON_PATH
+    store = open_processed_store(sys.argv[3] if len(sys.argv) > 3 else None)
+    added = migrate_from_json(store, source)
+    print(f"✅ 从 {source} 导入 {added} 条记录，当前共 {store.count()} 条")
+    store.close()
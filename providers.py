@@ -0,0 +1,237 @@
+"""
+可插拔的转录 / 总结服务商
+  TRANSCRIPTION_PROVIDER: assemblyai（默认）/ whisper / fake
+  SUMMARY_PROVIDER:       gemini（默认）/ fake
+fake 服务商不访问网络，延迟、失败率和单价都通过环境变量配置，
+用于离线压测流水线的并发、缓存和失败处理，以及比较不同服务商的吞吐和成本
+各服务商的 SDK 和 asyncio 只在实际调用时才导入
+"""
+
+import hashlib
+import os
+import random
+import threading
+import time
+
+# Gemini 总结使用的模型和生成参数（都会参与总结缓存键的计算）
+SUMMARY_MODEL = os.getenv("SUMMARY_MODEL", "gemini-1.5-flash")
+GENERATION_CONFIG = {}
+
+
+class TranscriptionProvider:
+    """转录服务商接口"""
+
+    name = None
+    cost_per_minute = 0.0  # 每分钟音频的费用（美元），用于成本估算
+
+    def cache_settings(self):
+        """影响转录结果的参数，参与转录缓存键的计算"""
+        return {"provider": self.name}
+
+    async def transcribe(self, audio_file, download_future=None, resume=None, on_progress=None):
+        """
+        转录音频文件，返回文本（在共享的后台事件循环中运行）
+
+        传入 download_future 时文件仍在下载，不支持边下载边上传的服务商需要先等待下载完成。
+        resume / on_progress 用于断点续传（见 job_queue），不支持的服务商忽略即可
+        """
+        raise NotImplementedError
+
+    def estimate_cost(self, audio_seconds):
+        """按音频时长估算转录费用（美元）"""
+        return self.cost_per_minute * (audio_seconds or 0) / 60
+
+
+class AssemblyAITranscription(TranscriptionProvider):
+    """AssemblyAI 转录（支持边下载边上传）"""
+
+    name = "assemblyai"
+
+    def __init__(self):
+        self.cost_per_minute = float(os.getenv("ASSEMBLYAI_COST_PER_MIN", "0.0025"))
+
+    def cache_settings(self):
+        from assemblyai_client import TRANSCRIPT_OPTIONS
+        return dict(TRANSCRIPT_OPTIONS, provider=self.name)
+
+    async def transcribe(self, audio_file, download_future=None, resume=None, on_progress=None):
+        from clients import get_assemblyai_client
+        return await get_assemblyai_client().transcribe(audio_file, download_future, resume, on_progress)
+
+
+class WhisperTranscription(TranscriptionProvider):
+    """OpenAI Whisper 转录（单个文件不能超过 25MB）"""
+
+    name = "whisper"
+
+    def __init__(self):
+        self.model = os.getenv("WHISPER_MODEL", "whisper-1")
+        self.cost_per_minute = float(os.getenv("WHISPER_COST_PER_MIN", "0.006"))
+
+    def cache_settings(self):
+        return {"provider": self.name, "model": self.model}
+
+    async def transcribe(self, audio_file, download_future=None, resume=None, on_progress=None):
+        import asyncio
+        if download_future is not None:
+            await asyncio.wrap_future(download_future)
+        return await asyncio.to_thread(self._transcribe, audio_file)
+
+    def _transcribe(self, audio_file):
+        from clients import get_openai_client
+        with open(audio_file, "rb") as f:
+            transcript = get_openai_client().audio.transcriptions.create(model=self.model, file=f)
+        return transcript.text
+
+
+class FakeTranscription(TranscriptionProvider):
+    """
+    本地模拟转录：等待 FAKE_TRANSCRIBE_LATENCY 秒后按 FAKE_TRANSCRIBE_FAILURE_RATE 的概率失败，
+    否则返回由音频文件决定的固定文本（同一文件结果相同，转录缓存照常生效）
+    """
+
+    name = "fake"
+
+    def __init__(self):
+        self.latency = float(os.getenv("FAKE_TRANSCRIBE_LATENCY", "2"))
+        self.failure_rate = float(os.getenv("FAKE_TRANSCRIBE_FAILURE_RATE", "0"))
+        self.words = int(os.getenv("FAKE_TRANSCRIPT_WORDS", "1500"))
+        self.cost_per_minute = float(os.getenv("FAKE_TRANSCRIBE_COST_PER_MIN", "0"))
+
+    def cache_settings(self):
+        return {"provider": self.name, "words": self.words}
+
+    async def transcribe(self, audio_file, download_future=None, resume=None, on_progress=None):
+        import asyncio
+        if download_future is not None:
+            await asyncio.wrap_future(download_future)
+        await asyncio.sleep(self.latency)
+        if random.random() < self.failure_rate:
+            raise RuntimeError("转录失败: 模拟的服务商错误")
+
+        seed = f"{os.path.basename(os.path.dirname(audio_file))}:{os.path.getsize(audio_file)}"
+        rng = random.Random(hashlib.sha256(seed.encode("utf-8")).hexdigest())
+        vocabulary = ["market", "growth", "risk", "strategy", "price", "trend", "data", "plan",
+                      "investors", "should", "watch", "the", "next", "quarter", "because", "demand"]
+        sentences = []
+        for start in range(0, self.words, 12):
+            words = [rng.choice(vocabulary) for _ in range(min(12, self.words - start))]
+            sentences.append(" ".join(words).capitalize() + ".")
+        return " ".join(sentences)
+
+
+class SummaryProvider:
+    """总结服务商接口"""
+
+    name = None
+    model = None
+    generation_config = {}
+    cost_per_1k_input = 0.0   # 每千个输入 token 的费用（美元）
+    cost_per_1k_output = 0.0  # 每千个输出 token 的费用（美元）
+
+    def generate(self, prompt, on_chunk=None):
+        """生成内容并返回全文；传入 on_chunk 时流式生成，每收到一段文本就调用 on_chunk(文本)"""
+        raise NotImplementedError
+
+    def estimate_cost(self, input_tokens, output_tokens):
+        """按 token 数估算费用（美元）"""
+        return (input_tokens * self.cost_per_1k_input + output_tokens * self.cost_per_1k_output) / 1000
+
+
+class GeminiSummary(SummaryProvider):
+    """Google Gemini 总结"""
+
+    name = "gemini"
+
+    def __init__(self):
+        self.model = SUMMARY_MODEL
+        self.generation_config = GENERATION_CONFIG
+        self.cost_per_1k_input = float(os.getenv("GEMINI_COST_PER_1K_INPUT", "0.000075"))
+        self.cost_per_1k_output = float(os.getenv("GEMINI_COST_PER_1K_OUTPUT", "0.0003"))
+
+    def generate(self, prompt, on_chunk=None):
+        from clients import get_gemini_model
+        model = get_gemini_model(self.model, self.generation_config)
+        if not on_chunk:
+            return model.generate_content(prompt).text
+
+        parts = []
+        for chunk in model.generate_content(prompt, stream=True):
+            try:
+                piece = chunk.text
+            except ValueError:
+                # 只带结束原因、没有文本的分块
+                continue
+            if piece:
+                parts.append(piece)
+                on_chunk(piece)
+        if not parts:
+            raise RuntimeError("模型未返回任何内容")
+        return "".join(parts)
+
+
+class FakeSummary(SummaryProvider):
+    """
+    本地模拟总结：在 FAKE_SUMMARY_LATENCY 秒内分几段输出固定格式的要点，
+    按 FAKE_SUMMARY_FAILURE_RATE 的概率失败
+    """
+
+    name = "fake"
+    model = "fake"
+    chunks = 5
+
+    def __init__(self):
+        self.latency = float(os.getenv("FAKE_SUMMARY_LATENCY", "1"))
+        self.failure_rate = float(os.getenv("FAKE_SUMMARY_FAILURE_RATE", "0"))
+        self.cost_per_1k_input = float(os.getenv("FAKE_SUMMARY_COST_PER_1K", "0"))
+        self.cost_per_1k_output = self.cost_per_1k_input
+
+    def generate(self, prompt, on_chunk=None):
+        if random.random() < self.failure_rate:
+            time.sleep(self.latency / 2)
+            raise RuntimeError("总结失败: 模拟的服务商错误")
+
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        parts = []
+        for index in range(self.chunks):
+            time.sleep(self.latency / self.chunks)
+            piece = f"{index + 1}. 模拟要点 {digest[index * 8:(index + 1) * 8]}\n"
+            parts.append(piece)
+            if on_chunk:
+                on_chunk(piece)
+        return "".join(parts)
+
+
+TRANSCRIPTION_PROVIDERS = {
+    "assemblyai": AssemblyAITranscription,
+    "whisper": WhisperTranscription,
+    "fake": FakeTranscription,
+}
+
+SUMMARY_PROVIDERS = {
+    "gemini": GeminiSummary,
+    "fake": FakeSummary,
+}
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def _get_provider(registry, kind, name):
+    if name not in registry:
+        raise ValueError(f"未知的{kind}服务商: {name}，可选: {', '.join(registry)}")
+    with _instances_lock:
+        key = (kind, name)
+        if key not in _instances:
+            _instances[key] = registry[name]()
+        return _instances[key]
+
+
+def get_transcription_provider(name=None):
+    """获取转录服务商（默认由 TRANSCRIPTION_PROVIDER 决定），同一进程内共享一个实例"""
+    return _get_provider(TRANSCRIPTION_PROVIDERS, "转录", name or os.getenv("TRANSCRIPTION_PROVIDER", "assemblyai"))
+
+
+def get_summary_provider(name=None):
+    """获取总结服务商（默认由 SUMMARY_PROVIDER 决定），同一进程内共享一个实例"""
+    return _get_provider(SUMMARY_PROVIDERS, "总结", name or os.getenv("SUMMARY_PROVIDER", "gemini"))
@@ -0,0 +1,155 @@
+"""
+按服务商限流
+每个服务商（youtube / assemblyai / gemini）共享一个令牌桶，所有工作线程从同一个桶里取令牌
+速率通过环境变量 <服务商>_RATE_PER_MIN 配置，0 表示不限流
+
+另外每个服务商有一个自适应冷却期：只有出现真实的限流信号（HTTP 429、机器人验证等）时才退避，
+退避时间指数增长、成功后逐步回落，并持久化到磁盘，多个进程和多次运行共享
+"""
+
+import json
+import os
+import threading
+import time
+
+from file_utils import atomic_write_json, file_lock
+from structured_log import get_logger, span
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+THROTTLE_STATE_FILE = os.path.join(SCRIPT_DIR, ".cache", "throttle.json")
+
+logger = get_logger("rate_limit")
+
+# 未配置环境变量时的默认速率：(每分钟请求数, 突发数)
+DEFAULT_RATES = {
+    "youtube": (20, 3),
+}
+
+# 冷却期的初始值和上限（秒）
+COOLDOWN_BASE = float(os.getenv("THROTTLE_COOLDOWN_BASE", "30"))
+COOLDOWN_MAX = float(os.getenv("THROTTLE_COOLDOWN_MAX", "900"))
+
+
+class RateLimiter:
+    """线程安全的令牌桶限流器"""
+
+    def __init__(self, rate_per_minute, burst=1):
+        self.rate = rate_per_minute / 60.0  # 每秒补充的令牌数
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _try_take(self):
+        """尝试取一个令牌，成功返回0，否则返回需要等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        """取一个令牌，令牌不足时阻塞等待"""
+        if self.rate <= 0:
+            return
+        while (wait := self._try_take()) > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """acquire 的协程版本，等待时不占用线程"""
+        if self.rate <= 0:
+            return
+        import asyncio
+        while (wait := self._try_take()) > 0:
+            await asyncio.sleep(wait)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider):
+    """获取指定服务商的共享限流器"""
+    with _limiters_lock:
+        if provider not in _limiters:
+            prefix = provider.upper()
+            default_rate, default_burst = DEFAULT_RATES.get(provider, (0, 1))
+            rate = float(os.getenv(f"{prefix}_RATE_PER_MIN", str(default_rate)))
+            burst = int(os.getenv(f"{prefix}_RATE_BURST", str(default_burst)))
+            _limiters[provider] = RateLimiter(rate, burst)
+        return _limiters[provider]
+
+
+class AdaptiveCooldown:
+    """出现限流信号时指数退避的冷却期，状态保存在 THROTTLE_STATE_FILE 中"""
+
+    def __init__(self, provider, path=THROTTLE_STATE_FILE, base=COOLDOWN_BASE, maximum=COOLDOWN_MAX):
+        self.provider = provider
+        self.path = path
+        self.base = base
+        self.maximum = maximum
+
+    def _load_all(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _update(self, func):
+        """加锁读取-修改-写回，返回修改后的状态"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with file_lock(self.path):
+            states = self._load_all()
+            state = states.get(self.provider, {"until": 0, "backoff": 0})
+            new_state = func(dict(state))
+            if new_state != state:
+                states[self.provider] = new_state
+                atomic_write_json(self.path, states)
+            return new_state
+
+    def remaining(self):
+        """冷却期剩余秒数"""
+        state = self._load_all().get(self.provider, {})
+        return max(0.0, state.get("until", 0) - time.time())
+
+    def wait(self):
+        """冷却期内阻塞等待，不在冷却期时立即返回"""
+        remaining = self.remaining()
+        if remaining > 0:
+            logger.warning(f"🐢 {self.provider} 冷却中，等待 {remaining:.0f}s...")
+            with span("cooldown", provider=self.provider):
+                time.sleep(remaining)
+
+    def record_throttle(self):
+        """记录一次限流信号，延长冷却期，返回本次冷却秒数"""
+        def bump(state):
+            backoff = min(self.maximum, max(self.base, state["backoff"] * 2))
+            return {"until": max(state["until"], time.time() + backoff), "backoff": backoff}
+        return self._update(bump)["backoff"]
+
+    def record_success(self):
+        """请求成功后退避时间减半，低于初始值时清零"""
+        if not self._load_all().get(self.provider, {}).get("backoff"):
+            return
+
+        def decay(state):
+            backoff = state["backoff"] / 2
+            return {"until": state["until"], "backoff": backoff if backoff >= self.base else 0}
+        self._update(decay)
+
+
+_cooldowns = {}
+
+
+def get_cooldown(provider):
+    """获取指定服务商的自适应冷却期"""
+    with _limiters_lock:
+        if provider not in _cooldowns:
+            _cooldowns[provider] = AdaptiveCooldown(provider)
+        return _cooldowns[provider]
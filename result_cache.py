@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+本地结果缓存
+每个条目是一个 gzip 压缩的 JSON 文件，保存在 .cache/<缓存名>/ 下；
+读取时刷新文件修改时间，总大小超过上限时按最近使用时间（LRU）淘汰最旧的条目
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_ROOT = os.path.join(SCRIPT_DIR, ".cache")
+
+
+def hash_key(*parts):
+    """把任意可JSON序列化的内容组合成稳定的 sha256 缓存键"""
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class DiskCache:
+    """按大小上限做 LRU 淘汰的磁盘缓存"""
+
+    def __init__(self, name, max_bytes):
+        self.name = name
+        self.directory = os.path.join(CACHE_ROOT, name)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.directory, hash_key(key)[:40] + ".json.gz")
+
+    def get(self, key):
+        """读取条目，未命中返回 None；命中时返回 {"key", "created_at", "meta", "value"}"""
+        path = self._path(key)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get("key") != key:
+            return None
+        # 刷新修改时间作为最近使用时间
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    def put(self, key, value, meta=None):
+        """写入条目（原子替换），然后按大小上限淘汰"""
+        entry = {"key": key, "created_at": time.time(), "meta": meta or {}, "value": value}
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb") as f:
+                f.write(json.dumps(entry, ensure_ascii=False).encode("utf-8"))
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.evict()
+
+    def _files(self):
+        """返回 [(路径, 大小, 最近使用时间)]"""
+        if not os.path.isdir(self.directory):
+            return []
+        files = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json.gz"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((path, stat.st_size, stat.st_mtime))
+        return files
+
+    def evict(self):
+        """总大小超过上限时删除最久未使用的条目，返回删除数量"""
+        with self._lock:
+            files = sorted(self._files(), key=lambda item: item[2])
+            total = sum(size for _, size, _ in files)
+            removed = 0
+            for path, size, _ in files:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                removed += 1
+            return removed
+
+    def stats(self):
+        """返回 (条目数, 总字节数)"""
+        files = self._files()
+        return len(files), sum(size for _, size, _ in files)
+
+    def entries(self):
+        """按最近使用时间倒序返回所有条目（不含 value）"""
+        entries = []
+        for path, size, used in sorted(self._files(), key=lambda item: item[2], reverse=True):
+            try:
+                with gzip.open(path, "rt", encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                continue
+            entries.append({
+                "key": entry.get("key"),
+                "created_at": entry.get("created_at"),
+                "last_used": used,
+                "size": size,
+                "meta": entry.get("meta", {}),
+            })
+        return entries
+
+    def clear(self):
+        """删除所有条目，返回删除数量"""
+        removed = 0
+        for path, _, _ in self._files():
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+        return removed
+
+
+# 转录缓存：按视频ID + 转录参数缓存转录文本，重新总结时无需再次下载和转录
+TRANSCRIPT_CACHE_MAX_MB = float(os.getenv("TRANSCRIPT_CACHE_MAX_MB", "500"))
+transcript_cache = DiskCache("transcripts", int(TRANSCRIPT_CACHE_MAX_MB * 1024 * 1024))
+
+
+def transcript_cache_key(video_id, settings):
+    """转录缓存键：视频ID + 转录参数的哈希"""
+    return f"{video_id}:{hash_key(settings)[:16]}"
+
+
+# 总结缓存：相同的转录文本 + prompt 模板 + 模型 + 生成参数直接复用总结结果
+SUMMARY_CACHE_MAX_MB = float(os.getenv("SUMMARY_CACHE_MAX_MB", "100"))
+summary_cache = DiskCache("summaries", int(SUMMARY_CACHE_MAX_MB * 1024 * 1024))
+
+
+def summary_cache_key(text, prompt_template, model, generation_config):
+    """总结缓存键：转录文本、prompt 模板、模型名和生成参数的哈希"""
+    return hash_key(text, prompt_template, model, generation_config)
+
+
+# 视频信息缓存：yt-dlp 提取的视频元数据（按视频ID），重试和重新处理时不再重复解析页面
+INFO_CACHE_MAX_MB = float(os.getenv("INFO_CACHE_MAX_MB", "50"))
+info_cache = DiskCache("info", int(INFO_CACHE_MAX_MB * 1024 * 1024))
+
+
+CACHES = {
+    "transcripts": transcript_cache,
+    "summaries": summary_cache,
+    "info": info_cache,
+}
+
+
+def _format_size(size):
+    return f"{size / 1024 / 1024:.2f} MB" if size >= 1024 * 1024 else f"{size / 1024:.1f} KB"
+
+
+def _format_time(timestamp):
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp)) if timestamp else "-"
+
+
+def print_usage():
+    print("用法:")
+    print("  python result_cache.py stats [transcripts|summaries|info]   查看条目数和占用空间")
+    print("  python result_cache.py list  [transcripts|summaries|info]   列出条目（按最近使用排序）")
+    print("  python result_cache.py show  <transcripts|summaries|info> <key>   查看条目内容")
+    print("  python result_cache.py clear [transcripts|summaries|info]   清空缓存")
+
+
+if __name__ == "__main__":
+    import sys
+
+    args = sys.argv[1:]
+    command = args[0] if args else "stats"
+    if command not in ("stats", "list", "show", "clear"):
+        print_usage()
+        sys.exit(1)
+
+    if command == "show":
+        if len(args) != 3 or args[1] not in CACHES:
+            print_usage()
+            sys.exit(1)
+        entry = CACHES[args[1]].get(args[2])
+        if entry is None:
+            print(f"❌ 未找到缓存条目: {args[2]}")
+            sys.exit(1)
+        print(f"🔑 {entry['key']}")
+        print(f"🕒 创建时间: {_format_time(entry.get('created_at'))}")
+        print(f"🏷️ {json.dumps(entry.get('meta', {}), ensure_ascii=False)}")
+        print("")
+        value = entry["value"]
+        print(value if isinstance(value, str) else json.dumps(value, ensure_ascii=False, indent=2))
+        sys.exit(0)
+
+    names = args[1:] or list(CACHES)
+    unknown = [name for name in names if name not in CACHES]
+    if unknown:
+        print(f"❌ 未知的缓存: {', '.join(unknown)}")
+        print_usage()
+        sys.exit(1)
+
+    for name in names:
+        cache = CACHES[name]
+        if command == "stats":
+            count, size = cache.stats()
+            print(f"📦 {name}: {count} 条，{_format_size(size)} / {_format_size(cache.max_bytes)}")
+        elif command == "list":
+            print(f"📦 {name}:")
+            for entry in cache.entries():
+                print(f"  {entry['key']}  {_format_size(entry['size'])}  "
+                      f"最近使用 {_format_time(entry['last_used'])}  "
+                      f"{json.dumps(entry['meta'], ensure_ascii=False)}")
+        elif command == "clear":
+            print(f"🗑️ {name}: 已删除 {cache.clear()} 条")
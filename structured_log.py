@@ -0,0 +1,270 @@
+"""
+结构化日志
+  - 各模块通过 get_logger(name) 获取 "yt.<name>" 日志器；setup_logging() 之后记录先放入内存队列，
+    由后台线程（QueueListener）统一写入，调用方不会被文件 I/O 阻塞
+  - 控制台和文本日志（auto.log）保持原来的 "[时间] 消息" 格式；另写一份 JSON Lines 日志（默认 auto.jsonl），
+    每行带上 level、logger、video_id / channel_id 以及计时字段，便于统计各阶段耗时
+  - 文件只在每隔 LOG_FLUSH_INTERVAL 秒、出现警告及以上级别或调用 flush_logging() 时刷新到磁盘
+  - span(stage) 记录一个阶段的耗时（只写入 JSON 日志）；video_context(video_id) 为其间的所有日志打上视频ID，
+    可以跨线程池和共享事件循环传递（asyncio 任务会复制创建时的上下文）
+
+用法: python structured_log.py [auto.jsonl]    按阶段汇总 JSON 日志中的耗时
+"""
+
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# 获取脚本所在目录
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_JSON_LOG = os.path.join(SCRIPT_DIR, "auto.jsonl")
+
+LOGGER_NAME = "yt"
+TEXT_FORMAT = "[%(asctime)s] %(message)s"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# 日志文件的刷新间隔（秒）
+FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", "1"))
+
+# 当前处理的视频ID，由 video_context 设置
+_video_id = contextvars.ContextVar("video_id", default=None)
+
+# LogRecord 自带的属性，其余属性（通过 extra 传入）都会写入 JSON 日志
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+_listener = None
+_handlers = []
+
+
+class _ContextFilter(logging.Filter):
+    """在产生日志的线程中补上当前的视频ID（必须在进入队列之前执行）"""
+
+    def filter(self, record):
+        if getattr(record, "video_id", None) is None:
+            video_id = _video_id.get()
+            if video_id is not None:
+                record.video_id = video_id
+        return True
+
+
+class _SkipSpans(logging.Filter):
+    """计时记录只写入 JSON 日志，不出现在控制台和文本日志中"""
+
+    def filter(self, record):
+        return getattr(record, "event", None) != "span"
+
+
+class JsonFormatter(logging.Formatter):
+    """每条记录输出为一行 JSON"""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for name, value in vars(record).items():
+            if name not in _RESERVED_ATTRS and value is not None:
+                entry[name] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _StdoutHandler(logging.StreamHandler):
+    """写到当前的 sys.stdout（而不是创建时的），以便调用方重定向输出"""
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+class BufferedFileHandler(logging.FileHandler):
+    """追加写入日志文件，每隔 FLUSH_INTERVAL 秒或遇到警告及以上级别时才刷新"""
+
+    def __init__(self, filename):
+        super().__init__(filename, mode="a", encoding="utf-8", delay=True)
+        self._last_flush = time.monotonic()
+        self._urgent = False
+
+    def emit(self, record):
+        self._urgent = record.levelno >= logging.WARNING
+        super().emit(record)
+
+    def flush(self):
+        if self._urgent or time.monotonic() - self._last_flush >= FLUSH_INTERVAL:
+            self.flush_now()
+
+    def flush_now(self):
+        with self.lock:
+            if self.stream is not None:
+                self.stream.flush()
+            self._last_flush = time.monotonic()
+
+
+class _FlushingQueueListener(logging.handlers.QueueListener):
+    """队列空闲时也会定期刷新文件，避免低流量时日志长时间停留在缓冲区"""
+
+    def dequeue(self, block):
+        while True:
+            try:
+                return self.queue.get(timeout=FLUSH_INTERVAL)
+            except queue.Empty:
+                for handler in self.handlers:
+                    if isinstance(handler, BufferedFileHandler):
+                        handler.flush()
+
+
+def _console_handler(fmt=TEXT_FORMAT):
+    handler = _StdoutHandler()
+    handler.setFormatter(logging.Formatter(fmt, DATE_FORMAT))
+    handler.addFilter(_SkipSpans())
+    return handler
+
+
+def get_logger(name):
+    """
+    获取 yt.<name> 日志器
+
+    没有调用 setup_logging() 时（例如作为库被导入或单独运行 yt_summarizer.py）直接同步输出消息到控制台
+    """
+    root = logging.getLogger(LOGGER_NAME)
+    if not root.handlers:
+        handler = _console_handler("%(message)s")
+        handler.addFilter(_ContextFilter())
+        root.addHandler(handler)
+        root.setLevel(logging.INFO)
+        root.propagate = False
+    return logging.getLogger(f"{LOGGER_NAME}.{name}")
+
+
+def setup_logging(text_file=None, json_file=None):
+    """
+    把 yt.* 日志接到后台写入线程：控制台 + text_file（原格式）+ json_file（JSON Lines）
+
+    重复调用会先关闭之前的配置再按新参数重新配置
+    """
+    global _listener, _handlers
+    shutdown_logging()
+
+    handlers = [_console_handler()]
+    if text_file:
+        text_handler = BufferedFileHandler(text_file)
+        text_handler.setFormatter(logging.Formatter(TEXT_FORMAT, DATE_FORMAT))
+        text_handler.addFilter(_SkipSpans())
+        handlers.append(text_handler)
+    if json_file:
+        json_handler = BufferedFileHandler(json_file)
+        json_handler.setFormatter(JsonFormatter())
+        handlers.append(json_handler)
+
+    log_queue = queue.Queue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(_ContextFilter())
+
+    root = logging.getLogger(LOGGER_NAME)
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(logging.INFO)
+    root.propagate = False
+
+    _handlers = handlers
+    _listener = _FlushingQueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def flush_logging():
+    """等待队列中的日志全部写出并刷新到磁盘"""
+    if _listener is None:
+        return
+    _listener.queue.join()
+    for handler in _handlers:
+        if isinstance(handler, BufferedFileHandler):
+            handler.flush_now()
+
+
+def shutdown_logging():
+    """写完剩余日志、停止后台线程并关闭日志文件"""
+    global _listener, _handlers
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _handlers:
+        handler.close()
+    _listener, _handlers = None, []
+
+
+@contextmanager
+def video_context(video_id):
+    """其间（包括其中创建的 asyncio 任务）产生的日志都带上 video_id"""
+    token = _video_id.set(video_id)
+    try:
+        yield
+    finally:
+        _video_id.reset(token)
+
+
+_span_logger = get_logger("span")
+
+
+@contextmanager
+def span(stage, video_id=None, **fields):
+    """
+    记录一个阶段的耗时（event=span, stage, duration 秒, status=ok/error），异常照常抛出
+
+    video_id 默认取 video_context 中的值，其余关键字参数（如 channel_id）原样写入日志
+    """
+    start = time.perf_counter()
+    status, error = "ok", None
+    try:
+        yield
+    except BaseException as e:
+        status, error = "error", str(e) or type(e).__name__
+        raise
+    finally:
+        duration = round(time.perf_counter() - start, 3)
+        extra = dict(fields, event="span", stage=stage, duration=duration, status=status, error=error)
+        if video_id is not None:
+            extra["video_id"] = video_id
+        _span_logger.info(f"⏱️ {stage} {duration:.3f}s ({status})", extra=extra)
+
+
+def summarize_spans(path):
+    """按阶段汇总 JSON 日志中的计时记录，返回 {stage: (次数, 总耗时, 最大耗时, 失败次数)}"""
+    stats = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if entry.get("event") != "span":
+                continue
+            count, total, longest, errors = stats.get(entry["stage"], (0, 0.0, 0.0, 0))
+            stats[entry["stage"]] = (count + 1, total + entry["duration"], max(longest, entry["duration"]),
+                                     errors + (entry.get("status") == "error"))
+    return stats
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else os.getenv("LOG_JSON_FILE") or DEFAULT_JSON_LOG
+    if not os.path.exists(path):
+        print(f"❌ 日志文件不存在: {path}")
+        sys.exit(1)
+    stats = summarize_spans(path)
+    print(f"{'阶段':<22}{'次数':>6}{'总耗时(s)':>12}{'平均(s)':>10}{'最长(s)':>10}{'失败':>6}")
+    for stage, (count, total, longest, errors) in sorted(stats.items(), key=lambda item: -item[1][1]):
+        print(f"{stage:<24}{count:>6}{total:>12.1f}{total / count:>10.2f}{longest:>10.2f}{errors:>6}")
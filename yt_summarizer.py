@@ -1,249 +1,499 @@
 import os
-import random
+import re
+import glob
+import json
 import time
 import subprocess
-import openai
-import google.generativeai as genai
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 import sys
+from dataclasses import dataclass, field
 from datetime import datetime
+from urllib.parse import urlparse, parse_qs
 from dotenv import load_dotenv
+# 后台事件循环所在的 assemblyai_client 会导入 asyncio，只在需要转录时才导入，保证 --help 等命令快速启动
+from providers import get_summary_provider, get_transcription_provider
+from result_cache import info_cache, summary_cache, summary_cache_key, transcript_cache, transcript_cache_key
+from rate_limit import get_cooldown, get_rate_limiter
+from structured_log import get_logger, span, video_context
 
 # ========== 配置 ==========
 # 加载环境变量
 load_dotenv()
 
-# 从环境变量获取 API Keys
-OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
-GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY') 
-ASSEMBLYAI_API_KEY = os.getenv('ASSEMBLYAI_API_KEY')
+# 视频信息缓存目录，以及下载时复用缓存 info json 的最长时间（格式链接约6小时后过期）
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+COOKIES_FILE = os.path.join(SCRIPT_DIR, "cookies.txt")  # 与脚本同目录，不依赖调用方的工作目录
+INFO_JSON_MAX_AGE = 5 * 3600
+# 缓存视频信息时去掉下载用不到的大字段（字幕、缩略图等），单个视频的信息可以从上MB缩小到几十KB
+INFO_DROP_FIELDS = ("automatic_captions", "subtitles", "thumbnails", "heatmap", "chapters")
 
+# 音频下载模式：
+#   native - 选择体积最小的纯音频流，保留原始封装（opus/m4a），不经过 ffmpeg 转码（默认）
+#   speech - 在 native 基础上转为单声道 16kHz 低码率 opus，进一步减小上传体积
+#   mp3    - 旧行为，转码为 mp3
+AUDIO_MODE = os.getenv('AUDIO_MODE', 'native')
 
-# 验证必要的 API Keys 是否存在
-if not OPENAI_API_KEY:
-    print("❌ 错误：未找到 OPENAI_API_KEY 环境变量")
-    print("请在 .env 文件中设置您的 OpenAI API Key")
-    sys.exit(1)
+# 体积最小且码率不低于 32kbps 的纯音频流（没有满足条件的则退回任意纯音频流）
+NATIVE_AUDIO_FORMAT = ["-f", "ba[abr>=32]/ba", "-S", "+size,+br"]
 
-if not GOOGLE_API_KEY:
-    print("❌ 错误：未找到 GOOGLE_API_KEY 环境变量")
-    print("请在 .env 文件中设置您的 Google API Key")
-    sys.exit(1)
+# 边下载边上传：yt-dlp 以原始音频格式写文件，上传同时读取正在增长的文件
+AUDIO_STREAM_UPLOAD = os.getenv('AUDIO_STREAM_UPLOAD', '0') == '1'
 
-if not ASSEMBLYAI_API_KEY:
-    print("❌ 错误：未找到 ASSEMBLYAI_API_KEY 环境变量")
-    print("请在 .env 文件中设置您的 AssemblyAI API Key")
-    sys.exit(1)
-
-# 配置 APIs
-openai.api_key = OPENAI_API_KEY
-genai.configure(api_key=GOOGLE_API_KEY)
+# 单次 yt-dlp 调用（提取信息 / 下载）的超时时间（秒），超时后结束进程并按失败处理
+YTDLP_TIMEOUT = float(os.getenv('YTDLP_TIMEOUT', '1800'))
 # ==========================
 
+logger = get_logger("yt_summarizer")
+
+
+@dataclass
+class SummaryResult:
+    """summarize_video 的处理结果"""
+    url: str
+    folder: str                                  # 输出文件夹路径
+    audio_file: str = None                       # 下载的音频文件路径
+    transcript: str = None                       # 转录文本
+    transcript_cached: bool = False              # 转录文本是否来自缓存（命中时跳过下载和转录）
+    summary: str = None                          # 总结文本，总结失败时为 None
+    language: str = None                         # 检测到的语言（zh / en）
+    timings: dict = field(default_factory=dict)  # 各阶段耗时（秒）
+    costs: dict = field(default_factory=dict)    # 各阶段估算费用（美元），命中缓存的阶段不计
+    error: str = None                            # 总结失败时的错误信息
+
+
+def _folder_path(folder_name, base_dir):
+    return os.path.join(base_dir, folder_name) if base_dir else folder_name
+
+
+# yt-dlp 错误输出中表示被 YouTube 限流的特征
+THROTTLE_SIGNALS = (
+    "http error 429",
+    "too many requests",
+    "not a bot",
+    "rate-limited",
+    "rate limited",
+)
+
+
+def is_throttled(stderr):
+    """根据 yt-dlp 的错误输出判断是否被限流"""
+    stderr = (stderr or "").lower()
+    return any(signal in stderr for signal in THROTTLE_SIGNALS)
+
+
+def _youtube_gate():
+    """每次访问 YouTube 前：等待限流冷却期结束，再从共享令牌桶取令牌"""
+    get_cooldown("youtube").wait()
+    get_rate_limiter("youtube").acquire()
+
+
+def _record_youtube_outcome(returncode, stderr):
+    """根据 yt-dlp 的结果更新 YouTube 冷却期"""
+    cooldown = get_cooldown("youtube")
+    if returncode == 0:
+        cooldown.record_success()
+    elif is_throttled(stderr):
+        seconds = cooldown.record_throttle()
+        logger.warning(f"🐢 检测到 YouTube 限流，冷却 {seconds:.0f}s")
+
+
+# 正在运行的 yt-dlp 进程，强制退出时由 terminate_downloads() 结束
+_processes_lock = threading.Lock()
+_processes = set()
+_terminating = threading.Event()
+
+
+def _start_ytdlp(cmd, **kwargs):
+    """启动 yt-dlp 进程并登记；terminate_downloads() 之后不再启动新进程"""
+    with _processes_lock:
+        if _terminating.is_set():
+            raise RuntimeError("正在退出，不再启动 yt-dlp")
+        process = subprocess.Popen(cmd, **kwargs)
+        _processes.add(process)
+    return process
+
+
+def _finish_ytdlp(process):
+    """结束登记（进程仍在运行时先结束它）"""
+    if process.poll() is None:
+        process.kill()
+        process.wait()
+    with _processes_lock:
+        _processes.discard(process)
+
+
+def terminate_downloads():
+    """强制退出时结束所有正在运行的 yt-dlp 进程，之后不再启动新的下载"""
+    with _processes_lock:
+        _terminating.set()
+        processes = list(_processes)
+    for process in processes:
+        if process.poll() is None:
+            process.kill()
+    if processes:
+        logger.warning(f"⚠️ 已终止 {len(processes)} 个正在运行的 yt-dlp 进程")
+
+
+def _communicate_ytdlp(cmd, capture_stdout=False):
+    """运行 yt-dlp 直到结束，超过 YTDLP_TIMEOUT 时结束进程并抛出 subprocess.TimeoutExpired，返回 (returncode, stdout, stderr)"""
+    process = _start_ytdlp(cmd, stdout=subprocess.PIPE if capture_stdout else None, stderr=subprocess.PIPE,
+                           text=True, encoding='utf-8', errors='replace')
+    try:
+        stdout, stderr = process.communicate(timeout=YTDLP_TIMEOUT)
+    finally:
+        _finish_ytdlp(process)
+    return process.returncode, stdout, stderr
+
+
+def _run_ytdlp(cmd):
+    """运行 yt-dlp，进度照常输出到终端，同时捕获错误输出用于识别限流，返回 (returncode, stderr)"""
+    _youtube_gate()
+    try:
+        returncode, _, stderr = _communicate_ytdlp(cmd)
+    except subprocess.TimeoutExpired:
+        logger.warning(f"⚠️ yt-dlp 运行超过 {YTDLP_TIMEOUT:.0f}s，已终止")
+        return -1, f"yt-dlp 运行超时（{YTDLP_TIMEOUT:.0f}s）"
+    if stderr:
+        sys.stderr.write(stderr)
+    _record_youtube_outcome(returncode, stderr)
+    return returncode, stderr
+
+
+def extract_video_id(video_url):
+    """
+    从 YouTube 链接中解析视频ID，无法解析时返回 None
+
+    支持 youtu.be/<id>、watch?v=<id> 以及 /shorts/<id>、/live/<id>、/embed/<id>、/v/<id>（频道feed中的短视频使用 /shorts/ 链接）
+    """
+    parsed = urlparse(video_url)
+    parts = [part for part in parsed.path.split("/") if part]
+    if parsed.netloc.endswith("youtu.be"):
+        return parts[0] if parts else None
+    if len(parts) >= 2 and parts[0] in ("shorts", "live", "embed", "v"):
+        return parts[1]
+    return parse_qs(parsed.query).get("v", [None])[0]
+
+
+def _remove_legacy_info_files():
+    """删除旧版直接写在 .cache/info/ 下、不受大小上限约束的 <视频ID>.info.json"""
+    for path in glob.glob(os.path.join(info_cache.directory, "*.info.json")):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _cached_info(video_url):
+    """视频信息缓存条目 {"created_at", "value", ...}，没有时返回 None"""
+    video_id = extract_video_id(video_url)
+    return info_cache.get(video_id) if video_id else None
 
-# 获取视频信息并创建文件夹
-def get_video_info_and_create_folder(video_url):
-    print("▶️ 正在获取视频信息...")
+
+def get_video_info(video_url):
+    """
+    获取视频元数据（id、title、uploader、upload_date、duration、formats 等）
     
-    # 使用 yt-dlp 获取视频元数据
-    cmd = [
-        "yt-dlp",
-        "--cookies", "cookies.txt",
-        "--print", "%(upload_date)s",
-        "--print", "%(uploader)s",
-        "--no-download",
-        video_url
-    ]
+    只调用一次 yt-dlp 提取，结果按视频ID存入视频信息缓存（按 INFO_CACHE_MAX_MB 做 LRU 淘汰），
+    重试和重新处理时直接读取缓存。下载阶段通过 --load-info-json 复用同一份数据，不再重复解析页面
+    
+    Returns:
+        dict: yt-dlp 的 info dict，提取失败时返回 None
+    """
+    video_id = extract_video_id(video_url)
+    entry = _cached_info(video_url)
+    if entry:
+        logger.info("📦 使用缓存的视频信息")
+        return entry["value"]
+    
+    cmd = ["yt-dlp", "--dump-single-json", "--no-download", video_url]
+    if os.path.exists(COOKIES_FILE):
+        cmd.insert(1, "--cookies")
+        cmd.insert(2, COOKIES_FILE)
+    
+    _youtube_gate()
+    try:
+        returncode, stdout, stderr = _communicate_ytdlp(cmd, capture_stdout=True)
+    except subprocess.TimeoutExpired:
+        logger.warning(f"⚠️ yt-dlp 提取视频信息超过 {YTDLP_TIMEOUT:.0f}s，已终止")
+        return None
+    _record_youtube_outcome(returncode, stderr)
+    if returncode != 0 or not stdout.strip():
+        logger.warning(f"⚠️ yt-dlp 提取视频信息失败: {stderr.strip()[-500:]}")
+        return None
+    
+    info = {key: value for key, value in json.loads(stdout).items() if key not in INFO_DROP_FIELDS}
+    _remove_legacy_info_files()
+    try:
+        info_cache.put(info.get("id") or video_id, info, meta={"title": info.get("title")})
+    except Exception as e:
+        logger.warning(f"⚠️ 写入视频信息缓存失败: {e}")
+    return info
+
+
+def _download_source_args(video_url, folder_path):
+    """
+    下载时优先复用缓存的 info json（格式链接会过期，只复用足够新的缓存），否则直接使用链接
+
+    复用时把信息写到视频文件夹中的 info.json 交给 yt-dlp，总结完成后随中间文件一起删除
+    """
+    entry = _cached_info(video_url)
+    if entry and time.time() - entry.get("created_at", 0) < INFO_JSON_MAX_AGE:
+        info_file = os.path.join(folder_path, "info.json")
+        with open(info_file, "w", encoding="utf-8") as f:
+            json.dump(entry["value"], f, ensure_ascii=False)
+        return ["--load-info-json", info_file]
+    return [video_url]
+
+
+def _create_folder(name, video_id, base_dir):
+    """创建视频的输出文件夹：日期_频道名_视频ID，每个视频独占一个文件夹（音频、转录、总结互不覆盖）"""
+    folder_name = _folder_path(f"{name}_{video_id}" if video_id else name, base_dir)
+    if not os.path.exists(folder_name):
+        os.makedirs(folder_name)
+        logger.info(f"✅ 创建文件夹: {folder_name}")
+    return folder_name
+
+
+# 获取视频信息并创建文件夹（base_dir 为空时在当前目录下创建）
+def get_video_info_and_create_folder(video_url, base_dir=None):
+    logger.info("▶️ 正在获取视频信息...")
+    video_id = extract_video_id(video_url)
     
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8')
-        lines = result.stdout.strip().split('\n')
+        info = get_video_info(video_url)
         
-        if len(lines) >= 2:
-            upload_date = lines[0]  # 格式：20250828
-            uploader = lines[1]     # 频道名
+        if info and info.get("upload_date") and info.get("uploader"):
+            upload_date = info["upload_date"]  # 格式：20250828
+            uploader = info["uploader"]        # 频道名
             
             # 格式化日期：20250828 -> 0828
             formatted_date = upload_date[4:8] if len(upload_date) == 8 else upload_date[-4:]
             
-            # 创建文件夹名：日期_频道名
-            folder_name = f"{formatted_date}_{uploader}"
-            
-            # 创建文件夹
-            if not os.path.exists(folder_name):
-                os.makedirs(folder_name)
-                print(f"✅ 创建文件夹: {folder_name}")
-            
-            return folder_name
+            # 创建文件夹：日期_频道名_视频ID（同一频道同一天的多个视频可能同时在流水线中处理）
+            return _create_folder(f"{formatted_date}_{uploader}", info.get("id") or video_id, base_dir)
         else:
             # 如果无法获取信息，使用当前日期
             current_date = datetime.now().strftime("%m%d")
-            folder_name = f"{current_date}_unknown"
-            if not os.path.exists(folder_name):
-                os.makedirs(folder_name)
-                print(f"✅ 创建文件夹: {folder_name}")
-            return folder_name
+            return _create_folder(f"{current_date}_unknown", video_id, base_dir)
             
     except Exception as e:
-        print(f"⚠️ 获取视频信息失败: {e}")
+        logger.warning(f"⚠️ 获取视频信息失败: {e}")
         # 使用当前日期作为备选
         current_date = datetime.now().strftime("%m%d")
-        folder_name = f"{current_date}_unknown"
-        if not os.path.exists(folder_name):
-            os.makedirs(folder_name)
-            print(f"✅ 创建文件夹: {folder_name}")
-        return folder_name
+        return _create_folder(f"{current_date}_unknown", video_id, base_dir)
+
+
+def _find_audio_file(folder_path):
+    """查找 yt-dlp 写入的音频文件（有多个时取最新的）"""
+    candidates = [
+        path for path in glob.glob(os.path.join(folder_path, "audio.*"))
+        if not path.endswith((".part", ".ytdl"))
+    ]
+    return max(candidates, key=os.path.getmtime) if candidates else None
+
+
+def _audio_format_args(folder_path):
+    """根据 AUDIO_MODE 返回 yt-dlp 的格式参数和输出路径模板"""
+    if AUDIO_MODE == "mp3":
+        return ["-x", "--audio-format", "mp3"], os.path.join(folder_path, "audio.mp3")
+    if AUDIO_MODE == "speech":
+        args = NATIVE_AUDIO_FORMAT + [
+            "-x", "--audio-format", "opus",
+            "--postprocessor-args", "ExtractAudio:-ac 1 -ar 16000 -b:a 24k"
+        ]
+        return args, os.path.join(folder_path, "audio.opus")
+    return list(NATIVE_AUDIO_FORMAT), os.path.join(folder_path, "audio.%(ext)s")
 
 
 # Step 1: 稳定下载音频
 def download_audio(video_url, folder_path, max_retries=3):
-    output_file = os.path.join(folder_path, "audio.mp3")
+    """
+    下载音频，失败时重试
+    
+    不再固定随机等待：请求节奏由共享令牌桶控制，只有 yt-dlp 输出限流信号时才进入冷却期
+    """
+    format_args, output_template = _audio_format_args(folder_path)
     attempt = 0
     while attempt < max_retries:
-        try:
-            # 随机等待，模拟正常观看
-            delay = random.randint(3, 10)
-            print(f"⏳ 等待 {delay}s 再开始下载...")
-            time.sleep(delay)
-
-            # 基础命令
-            cmd = [
-                "yt-dlp",
-                "-x",
-                "--audio-format", "mp3",
-                "-o", output_file,
-                "--user-agent", "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-                "--extractor-retries", "3",
-                "--fragment-retries", "3",
-                "--retry-sleep", "3",
-                video_url
-            ]
-
-            # 如果存在cookies文件则使用，否则跳过
-            if os.path.exists("cookies.txt"):
-                cmd.insert(1, "--cookies")
-                cmd.insert(2, "cookies.txt")
-                print("▶️ 使用cookies文件下载音频...")
-            else:
-                print("▶️ 不使用cookies下载音频...")
-
-            print("▶️ 正在运行 yt-dlp 下载音频...")
-            subprocess.run(cmd, check=True)
-            print("✅ 下载成功:", output_file)
+        # 基础命令
+        cmd = [
+            "yt-dlp",
+            *format_args,
+            "-o", output_template,
+            "--user-agent", "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+            "--extractor-retries", "3",
+            "--fragment-retries", "3",
+            "--retry-sleep", "3",
+            *_download_source_args(video_url, folder_path)
+        ]
+
+        # 如果存在cookies文件则使用，否则跳过
+        if os.path.exists(COOKIES_FILE):
+            cmd.insert(1, "--cookies")
+            cmd.insert(2, COOKIES_FILE)
+            logger.info("▶️ 使用cookies文件下载音频...")
+        else:
+            logger.info("▶️ 不使用cookies下载音频...")
+
+        logger.info("▶️ 正在运行 yt-dlp 下载音频...")
+        returncode, stderr = _run_ytdlp(cmd)
+        if returncode == 0:
+            output_file = _find_audio_file(folder_path)
+            if output_file is None:
+                raise RuntimeError("yt-dlp 已结束但找不到音频文件")
+            logger.info(f"✅ 下载成功: {output_file}")
             return output_file
 
-        except subprocess.CalledProcessError as e:
-            attempt += 1
-            print(f"⚠️ 下载失败 (第 {attempt}/{max_retries} 次)，错误: {e}")
-            if attempt >= max_retries:
-                print("❌ 超过最大重试次数，下载失败。")
-                raise
-            else:
-                cooldown = random.randint(20, 60)
-                print(f"🔄 等待 {cooldown}s 后重试...")
-                time.sleep(cooldown)
-
-
-# # Step 2: Whisper 转录
-# def transcribe_audio(audio_file, folder_path):
-#     transcript_file = os.path.join(folder_path, "transcript.txt")
-#     print("▶️ 正在转录音频...")
-#     client = openai.OpenAI(api_key=openai.api_key)
-#     with open(audio_file, "rb") as f:
-#         transcript = client.audio.transcriptions.create(
-#             model="whisper-1",
-#             file=f
-#         )
-#     text = transcript.text
-#     with open(transcript_file, "w", encoding="utf-8") as f:
-#         f.write(text)
-#     print("✅ 转录完成，保存到:", transcript_file)
-#     return text
-
-# Step 2 - A: AssemblyAI 转录
-import requests
+        attempt += 1
+        error = subprocess.CalledProcessError(returncode, cmd, stderr=stderr)
+        logger.warning(f"⚠️ 下载失败 (第 {attempt}/{max_retries} 次)，错误: {error}")
+        if attempt >= max_retries:
+            logger.error("❌ 超过最大重试次数，下载失败。")
+            raise error
+        # 被限流时下一次请求前会等待冷却期，其他错误直接重试
+        logger.info("🔄 重试下载...")
 
-def transcribe_audio(audio_file, folder_path):
+
+# Step 1 - B: 边下载边上传
+def download_audio_streaming(video_url, folder_path, on_started=None, max_retries=3):
+    """
+    以原始音频格式下载（不转码，忽略 AUDIO_MODE），yt-dlp 直接写入最终文件
+    
+    上传开始前下载失败时，删除残留的音频文件并改用 download_audio 重试（同样经过限流冷却）；
+    上传开始后已发出的部分无法撤回，失败通过 download_future 交给转录阶段，由任务队列在之后重试
+    
+    Args:
+        video_url (str): YouTube 视频链接
+        folder_path (str): 目标文件夹路径
+        on_started (callable): 音频文件出现后立即调用 on_started(audio_file, download_future)，
+            调用方可以据此开始上传；download_future 在下载结束时完成，下载失败时带异常
+        max_retries (int): 改用普通下载后的最大尝试次数
+    
+    Returns:
+        str: 音频文件路径；若下载过快、文件出现前就已结束，则不会调用 on_started
     """
-    使用 AssemblyAI API 将音频文件转录为文本
+    started = []
+    
+    def notify(audio_file, download_future):
+        started.append(audio_file)
+        if on_started:
+            on_started(audio_file, download_future)
+    
+    try:
+        return _stream_audio(video_url, folder_path, notify)
+    except Exception as e:
+        if started or _terminating.is_set():
+            raise
+        logger.warning(f"⚠️ 边下载边上传失败，改为普通下载重试: {e}")
+    for path in glob.glob(os.path.join(folder_path, "audio.*")):
+        os.remove(path)
+    return download_audio(video_url, folder_path, max_retries=max_retries)
+
+
+def _stream_audio(video_url, folder_path, on_started):
+    """运行一次边下载边上传的 yt-dlp，参数和返回值同 download_audio_streaming"""
+    cmd = [
+        "yt-dlp",
+        *NATIVE_AUDIO_FORMAT,
+        "--no-part",
+        "--http-chunk-size", "10M",
+        "-o", os.path.join(folder_path, "audio.%(ext)s"),
+        "--user-agent", "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+        "--extractor-retries", "3",
+        "--fragment-retries", "3",
+        "--retry-sleep", "3",
+        *_download_source_args(video_url, folder_path)
+    ]
+    if os.path.exists(COOKIES_FILE):
+        cmd.insert(1, "--cookies")
+        cmd.insert(2, COOKIES_FILE)
+    
+    logger.info("▶️ 正在运行 yt-dlp 下载音频（边下载边上传）...")
+    download_future = Future()
+    audio_file = None
+    
+    _youtube_gate()
+    with tempfile.TemporaryFile(mode="w+", encoding="utf-8", errors="replace") as stderr_file:
+        process = _start_ytdlp(cmd, stderr=stderr_file)
+        deadline = time.monotonic() + YTDLP_TIMEOUT
+        try:
+            while process.poll() is None:
+                if time.monotonic() > deadline:
+                    process.kill()
+                    process.wait()
+                    error = subprocess.TimeoutExpired(cmd, YTDLP_TIMEOUT)
+                    download_future.set_exception(error)
+                    logger.error(f"❌ 下载超过 {YTDLP_TIMEOUT:.0f}s，已终止")
+                    raise error
+                if audio_file is None:
+                    audio_file = _find_audio_file(folder_path)
+                    if audio_file and on_started:
+                        on_started(audio_file, download_future)
+                time.sleep(0.2)
+        finally:
+            _finish_ytdlp(process)
+        stderr_file.seek(0)
+        stderr = stderr_file.read()
+    
+    if stderr:
+        sys.stderr.write(stderr)
+    _record_youtube_outcome(process.returncode, stderr)
+    
+    if process.returncode != 0:
+        error = subprocess.CalledProcessError(process.returncode, cmd, stderr=stderr)
+        download_future.set_exception(error)
+        logger.error(f"❌ 下载失败: {error}")
+        raise error
+    
+    audio_file = audio_file or _find_audio_file(folder_path)
+    if audio_file is None:
+        error = RuntimeError("yt-dlp 已结束但找不到音频文件")
+        download_future.set_exception(error)
+        raise error
+    
+    download_future.set_result(audio_file)
+    logger.info(f"✅ 下载成功: {audio_file}")
+    return audio_file
+
+
+# Step 2: 转录（服务商由 TRANSCRIPTION_PROVIDER 选择）
+async def transcribe_audio_async(audio_file, folder_path, download_future=None, resume=None, on_progress=None):
+    """
+    使用当前转录服务商将音频文件转录为文本（在共享的后台事件循环中运行）
     
     Args:
         audio_file (str): 音频文件的完整路径
         folder_path (str): 目标文件夹路径，用于保存转录文件
+        download_future (Future): 文件仍在下载时传入，上传会跟随文件增长直到下载完成
+        resume (dict): 之前运行留下的 upload_url / transcript_id，从对应步骤继续
+        on_progress (callable): 上传完成、转录任务创建后调用 on_progress(stage, **fields)，用于记录断点
     
     Returns:
         str: 转录后的文本内容
     """
     # 构建转录文件的保存路径
     transcript_file = os.path.join(folder_path, "transcript.txt")
-    print("▶️ 正在转录音频...")
-    
-    # AssemblyAI 配置
-    base_url = "https://api.assemblyai.com"
-    
-    headers = {
-        "authorization": ASSEMBLYAI_API_KEY
-    }
-    
-    # Step 1: 上传本地音频文件
-    print("📤 正在上传音频文件...")
-    with open(audio_file, "rb") as f:
-        response = requests.post(base_url + "/v2/upload", 
-                               headers=headers, 
-                               data=f)
-    
-    if response.status_code != 200:
-        raise RuntimeError(f"文件上传失败: {response.text}")
-    
-    audio_url = response.json()["upload_url"]
-    print("✅ 文件上传成功")
-    
-    # Step 2: 创建转录任务
-    print("🔄 创建转录任务...")
-    data = {
-        "audio_url": audio_url,
-        "speech_model": "universal",
-        "language_detection": True,  # 启用自动语言检测
-        "auto_chapters": False,
-        "summarization": False,
-        "sentiment_analysis": False
-    }
-    
-    url = base_url + "/v2/transcript"
-    response = requests.post(url, json=data, headers=headers)
-    
-    if response.status_code != 200:
-        raise RuntimeError(f"转录任务创建失败: {response.text}")
-    
-    transcript_id = response.json()['id']
-    polling_endpoint = base_url + "/v2/transcript/" + transcript_id
-    print(f"📋 转录任务已创建，ID: {transcript_id}")
-    
-    
-    # Step 3: 轮询转录状态
-    print("⏳ 等待转录完成...")
-    while True:
-        transcription_result = requests.get(polling_endpoint, headers=headers).json()
-        
-        if transcription_result['status'] == 'completed':
-            transcript_text = transcription_result['text']
-            print("✅ 转录完成!")
-            break
-        
-        elif transcription_result['status'] == 'error':
-            raise RuntimeError(f"转录失败: {transcription_result['error']}")
-        
-        else:
-            print(f"📊 转录状态: {transcription_result['status']}...")
-            time.sleep(3)
+    provider = get_transcription_provider()
+    logger.info(f"▶️ 正在转录音频 ({provider.name})...")
+    
+    transcript_text = await provider.transcribe(audio_file, download_future, resume, on_progress)
     
-    # Step 4: 保存转录文本到文件
+    # 保存转录文本到文件
     with open(transcript_file, "w", encoding="utf-8") as f:
         f.write(transcript_text)
     
-    print("✅ 转录完成，保存到:", transcript_file)
+    logger.info(f"✅ 转录完成，保存到: {transcript_file}")
     return transcript_text
 
 
+def transcribe_audio(audio_file, folder_path):
+    """transcribe_audio_async 的同步版本"""
+    from assemblyai_client import run_coroutine
+    return run_coroutine(transcribe_audio_async(audio_file, folder_path)).result()
+
+
 # 语言检测函数
 def detect_language(text):
     """
@@ -275,21 +525,9 @@ def detect_language(text):
         return "en"
 
 
-# Step 3: Gemini 总结
-def summarize_text(text, folder_path):
-    summary_file = os.path.join(folder_path, "summary.txt")
-    print("▶️ 正在总结内容...")
-    
-    # 检测转录文本的语言
-    detected_lang = detect_language(text)
-    print(f"🌐 检测到语言: {'中文' if detected_lang == 'zh' else '英文'}")
-    
-    # 使用 Gemini 1.5 Flash 模型
-    model = genai.GenerativeModel('gemini-1.5-flash')
-    
-    # 根据检测到的语言选择对应的prompt
-    if detected_lang == "zh":
-        prompt = f"""你是专业的内容总结员。基于转录文本，提炼4-6条关键结论/要点，偏向可执行或判断性的观点。
+# 按语言选择的总结 prompt 模板，{text} 处填入转录文本
+PROMPT_TEMPLATES = {
+    "zh": """你是专业的内容总结员。基于转录文本，提炼4-6条关键结论/要点，偏向可执行或判断性的观点。
 
 要求：
 1.使用与转录文本相同的语言进行总结。
@@ -301,9 +539,8 @@ def summarize_text(text, folder_path):
 转录内容：
 {text}
 
-请用中文总结："""
-    else:
-        prompt = f"""You are a professional content summarizer. Based on the transcript text, extract 4-6 key conclusions/points, focusing on actionable or judgmental viewpoints.
+请用中文总结：""",
+    "en": """You are a professional content summarizer. Based on the transcript text, extract 4-6 key conclusions/points, focusing on actionable or judgmental viewpoints.
 
 Requirements:
 1. Use the SAME LANGUAGE as the transcript text.
@@ -315,22 +552,384 @@ Requirements:
 Transcript content:
 {text}
 
-Please summarize in English:"""
+Please summarize in English:""",
+}
+
+
+# 超长转录文本使用 map-reduce 总结：先把文本切成若干片段并发总结，再合并为最终要点
+# 估算 token 数超过 MAP_REDUCE_THRESHOLD_TOKENS 时启用，每个片段不超过 SUMMARY_CHUNK_TOKENS
+MAP_REDUCE_THRESHOLD_TOKENS = int(os.getenv('MAP_REDUCE_THRESHOLD_TOKENS', '30000'))
+SUMMARY_CHUNK_TOKENS = int(os.getenv('SUMMARY_CHUNK_TOKENS', '8000'))
+SUMMARY_MAP_WORKERS = int(os.getenv('SUMMARY_MAP_WORKERS', '4'))
+
+# 使用流式接口生成总结：首段文本到达后立即写入文件并交给调用方
+SUMMARY_STREAM = os.getenv('SUMMARY_STREAM', '1') == '1'
+
+# map 阶段：总结单个片段
+CHUNK_PROMPT_TEMPLATES = {
+    "zh": """以下是一段长视频转录文本中的一个片段。请提炼这个片段中的关键观点和结论，保留可执行的建议和判断性的观点，不要包含无关细节。
+
+转录片段：
+{text}
+
+请用中文列出要点：""",
+    "en": """The following is one segment of a long video transcript. Extract the key points and conclusions of this segment, keeping actionable insights and judgmental viewpoints, without irrelevant details.
+
+Transcript segment:
+{text}
+
+Please list the key points in English:""",
+}
+
+# reduce 阶段：把各片段的要点合并为最终总结
+REDUCE_PROMPT_TEMPLATES = {
+    "zh": """你是专业的内容总结员。以下是一段长视频按顺序分段提炼出的要点。请基于全部片段，提炼4-6条关键结论/要点，偏向可执行或判断性的观点。
+
+要求：
+1.合并重复的观点，不要逐段复述。
+2.重点突出 可执行的观点或带有判断性的结论。
+3.不要包含无关细节或冗长的讨论。
+4.确保总结 清晰、简洁、易于理解。
+
+各片段要点：
+{text}
+
+请用中文总结：""",
+    "en": """You are a professional content summarizer. Below are key points extracted, in order, from the segments of a long video. Based on all segments, extract 4-6 key conclusions/points, focusing on actionable or judgmental viewpoints.
+
+Requirements:
+1. Merge repeated points instead of restating each segment.
+2. Focus on actionable insights or judgmental viewpoints.
+3. Do not include irrelevant details or lengthy discussions.
+4. Ensure the summary is clear, concise, and easy to understand.
+
+Segment key points:
+{text}
+
+Please summarize in English:""",
+}
+
+
+def estimate_tokens(text):
+    """粗略估算 token 数：中文字符约1个token，其余字符约4个字符1个token"""
+    cjk = sum(1 for char in text if '\u4e00' <= char <= '\u9fff')
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def _split_sentences(paragraph):
+    """按句末标点切分句子，标点保留在句子末尾"""
+    return [sentence for sentence in re.split(r'(?<=[。！？!?.])\s*', paragraph) if sentence.strip()]
+
+
+def split_into_chunks(text, max_tokens=SUMMARY_CHUNK_TOKENS):
+    """
+    把文本切成估算 token 数不超过 max_tokens 的片段
+
+    优先在段落边界切分；单个段落过长时在句子边界切分；单个句子仍然过长时按字符硬切
+    """
+    pieces = []
+    for paragraph in text.split("\n"):
+        if not paragraph.strip():
+            continue
+        if estimate_tokens(paragraph) <= max_tokens:
+            pieces.append(paragraph)
+            continue
+        for sentence in _split_sentences(paragraph):
+            while estimate_tokens(sentence) > max_tokens:
+                # 每个字符至多约1个token，按 max_tokens 个字符硬切一定不会超限
+                pieces.append(sentence[:max_tokens])
+                sentence = sentence[max_tokens:]
+            pieces.append(sentence)
+
+    chunks, current, current_tokens = [], [], 0
+    for piece in pieces:
+        tokens = estimate_tokens(piece) + 1  # 加上换行分隔符
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append("\n".join(current))
+            current, current_tokens = [], 0
+        current.append(piece)
+        current_tokens += tokens
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def _map_reduce_summary(text, lang, on_chunk=None, spent=None):
+    """分片并发总结后再合并，返回最终总结；只有最后的合并步骤流式输出"""
+    chunks = split_into_chunks(text)
+    logger.info(f"🧩 转录文本较长，分为 {len(chunks)} 个片段并发总结...")
+    with ThreadPoolExecutor(max_workers=max(1, SUMMARY_MAP_WORKERS), thread_name_prefix="summary-map") as executor:
+        partials = list(executor.map(lambda chunk: _generate(CHUNK_PROMPT_TEMPLATES[lang], chunk, spent=spent), chunks))
+
+    logger.info("🔗 正在合并各片段要点...")
+    combined = "\n\n".join(f"[{index}/{len(partials)}]\n{partial}" for index, partial in enumerate(partials, 1))
+    return _generate(REDUCE_PROMPT_TEMPLATES[lang], combined, on_chunk, spent)
+
+
+def _generate(prompt_template, text, on_chunk=None, spent=None):
+    """
+    用 prompt 模板和文本调用总结服务商（由 SUMMARY_PROVIDER 选择）生成内容
+
+    相同的文本、模板、模型和生成参数命中总结缓存时直接返回缓存结果，不再调用模型；
+    只有真正调用模型时才从该服务商的限流器取令牌。
+    传入 on_chunk 且开启 SUMMARY_STREAM 时使用流式接口，每收到一段文本就调用 on_chunk(文本)；
+    传入 spent 列表时每次实际调用模型都追加该次的估算费用（命中缓存不计）
+    """
+    provider = get_summary_provider()
+    key = summary_cache_key(text, prompt_template, provider.model, provider.generation_config)
+    entry = summary_cache.get(key)
+    if entry:
+        logger.info("📦 命中总结缓存，跳过模型调用")
+        if on_chunk:
+            on_chunk(entry["value"])
+        return entry["value"]
+
+    get_rate_limiter(provider.name).acquire()
+    prompt = prompt_template.format(text=text)
+    if on_chunk and SUMMARY_STREAM:
+        summary = provider.generate(prompt, on_chunk)
+    else:
+        summary = provider.generate(prompt)
+        if on_chunk:
+            on_chunk(summary)
+    if spent is not None:
+        spent.append(provider.estimate_cost(estimate_tokens(prompt), estimate_tokens(summary)))
+    try:
+        summary_cache.put(key, summary, meta={"model": provider.model, "chars": len(text)})
+    except Exception as e:
+        logger.warning(f"⚠️ 写入总结缓存失败: {e}")
+    return summary
+
+
+# Step 3: 总结（服务商由 SUMMARY_PROVIDER 选择，默认 Gemini）
+def summarize_text(text, folder_path, detected_lang=None, on_chunk=None, timings=None, costs=None):
+    """
+    总结转录文本并保存到 summary.txt
+
+    生成过程中逐段写入 summary.txt；传入 on_chunk 时每收到一段文本就调用 on_chunk(文本)，
+    此时由调用方负责展示总结，这里不再打印全文。
+    传入 timings 字典时把首个文本到达的耗时记录为 timings["summarize_first_token"]；
+    传入 costs 字典时把本次实际调用模型的估算费用记录为 costs["summarize"]（全部命中总结缓存时为 0）
+    """
+    summary_file = os.path.join(folder_path, "summary.txt")
+    logger.info("▶️ 正在总结内容...")
+    start = time.perf_counter()
     
-    response = model.generate_content(prompt)
-    summary = response.text
+    # 检测转录文本的语言
+    detected_lang = detected_lang or detect_language(text)
+    logger.info(f"🌐 检测到语言: {'中文' if detected_lang == 'zh' else '英文'}")
     
-    print("✅ 总结完成:\n")
-    print(summary)
-
-    # 保存总结
+    spent = []
     with open(summary_file, "w", encoding="utf-8") as f:
-        f.write(summary)
-    print("📂 总结已保存到", summary_file)
+        def write_chunk(piece):
+            if timings is not None and "summarize_first_token" not in timings:
+                timings["summarize_first_token"] = round(time.perf_counter() - start, 3)
+            f.write(piece)
+            f.flush()
+            if on_chunk:
+                on_chunk(piece)
+
+        try:
+            # 根据检测到的语言选择对应的prompt；超长文本使用 map-reduce 总结
+            lang = "zh" if detected_lang == "zh" else "en"
+            if estimate_tokens(text) > MAP_REDUCE_THRESHOLD_TOKENS:
+                summary = _map_reduce_summary(text, lang, write_chunk, spent)
+            else:
+                summary = _generate(PROMPT_TEMPLATES[lang], text, write_chunk, spent)
+        except BaseException:
+            # 不留下不完整的总结文件
+            f.close()
+            os.remove(summary_file)
+            raise
+    
+    if costs is not None:
+        costs["summarize"] = round(sum(spent), 6)
+    if not on_chunk:
+        logger.info(f"✅ 总结完成:\n\n{summary}")
+    logger.info(f"📂 总结已保存到 {summary_file}")
 
     return summary
 
 
+def _timed(result, stage, func, *args):
+    """执行一个阶段并把耗时记录到 result.timings（同时写入结构化日志）"""
+    stage_start = time.perf_counter()
+    try:
+        with span(stage):
+            return func(*args)
+    finally:
+        result.timings[stage] = round(time.perf_counter() - stage_start, 3)
+
+
+def _transcript_key(video_url):
+    """转录缓存键（视频ID + 转录参数），无法解析视频ID时返回 None"""
+    video_id = extract_video_id(video_url)
+    if not video_id:
+        return None
+    return transcript_cache_key(video_id, get_transcription_provider().cache_settings())
+
+
+def _video_duration(video_url):
+    """从缓存的视频信息中读取时长（秒），没有缓存时返回 None"""
+    entry = _cached_info(video_url)
+    return entry["value"].get("duration") if entry else None
+
+
+def _remember_transcript(result, text):
+    """记录转录结果和估算费用，并写入转录缓存"""
+    result.transcript = text
+    result.costs["transcribe"] = round(get_transcription_provider().estimate_cost(_video_duration(result.url)), 6)
+    result.language = detect_language(text)
+    key = _transcript_key(result.url)
+    if key:
+        try:
+            transcript_cache.put(key, text, meta={"url": result.url, "language": result.language, "chars": len(text)})
+        except Exception as e:
+            logger.warning(f"⚠️ 写入转录缓存失败: {e}")
+
+
+# 计入总耗时的阶段（summarize_first_token 包含在 summarize 之内，不重复计算）
+STAGES = ("metadata", "download", "transcribe", "summarize")
+
+
+# 以下三个阶段函数可以由 summarize_video 顺序调用，也可以由 pipeline 分别放入不同的线程池
+def _load_cached_transcript(result):
+    """命中转录缓存时把文本填入 result 并返回 True"""
+    key = _transcript_key(result.url)
+    entry = transcript_cache.get(key) if key else None
+    if not entry:
+        return False
+    logger.info("📦 命中转录缓存，跳过下载和转录")
+    result.transcript = entry["value"]
+    result.transcript_cached = True
+    result.language = detect_language(result.transcript)
+    return True
+
+
+def download_stage(video_url, base_dir=None, on_audio_started=None):
+    """
+    阶段一：获取视频信息、创建文件夹并下载音频，返回 SummaryResult
+    
+    开启 AUDIO_STREAM_UPLOAD 且提供 on_audio_started 时，音频文件一出现就调用
+    on_audio_started(result, download_future)，调用方可以立即开始转录阶段的上传
+    """
+    result = SummaryResult(url=video_url, folder=None)
+    result.folder = _timed(result, "metadata", get_video_info_and_create_folder, video_url, base_dir)
+    
+    # 已有相同参数的转录结果时跳过下载和转录
+    if _load_cached_transcript(result):
+        return result
+    
+    if AUDIO_STREAM_UPLOAD and on_audio_started:
+        def on_started(audio_file, download_future):
+            result.audio_file = audio_file
+            on_audio_started(result, download_future)
+        result.audio_file = _timed(result, "download", download_audio_streaming, video_url, result.folder, on_started)
+    else:
+        result.audio_file = _timed(result, "download", download_audio, video_url, result.folder)
+    return result
+
+
+def resume_stage(video_url, folder, audio_file=None):
+    """
+    阶段一的断点续传版本：文件夹和音频已在之前的运行中准备好，跳过获取信息和下载，返回 SummaryResult
+
+    音频文件已不存在时 audio_file 为 None（只有还能继续等待已创建的转录任务时才有意义）；
+    转录缓存已被清理但文件夹中还留有 transcript.txt 时直接使用该文件
+    """
+    result = SummaryResult(url=video_url, folder=folder)
+    if audio_file and os.path.exists(audio_file):
+        result.audio_file = audio_file
+    if not _load_cached_transcript(result):
+        transcript_file = os.path.join(folder, "transcript.txt")
+        if os.path.exists(transcript_file):
+            with open(transcript_file, "r", encoding="utf-8") as f:
+                result.transcript = f.read()
+            result.language = detect_language(result.transcript)
+    return result
+
+
+def transcribe_stage(result):
+    """阶段二：转录音频（命中缓存时直接返回），返回转录文本"""
+    if result.transcript is not None:
+        return result.transcript
+    text = _timed(result, "transcribe", transcribe_audio, result.audio_file, result.folder)
+    _remember_transcript(result, text)
+    return text
+
+
+async def transcribe_stage_async(result, download_future=None, resume=None, on_progress=None):
+    """阶段二的协程版本，供流水线在共享事件循环中并发转录（resume / on_progress 见 transcribe_audio_async）"""
+    if result.transcript is not None:
+        return result.transcript
+    stage_start = time.perf_counter()
+    try:
+        with span("transcribe"):
+            text = await transcribe_audio_async(result.audio_file, result.folder, download_future, resume, on_progress)
+    finally:
+        result.timings["transcribe"] = round(time.perf_counter() - stage_start, 3)
+    _remember_transcript(result, text)
+    return text
+
+
+def summarize_stage(result, text, on_chunk=None):
+    """
+    阶段三：生成总结并清理中间文件；总结失败时记录错误并保留音频
+    
+    on_chunk 会在流式生成时收到每一段总结文本，首段到达的耗时记录为 timings["summarize_first_token"]
+    """
+    try:
+        result.summary = _timed(result, "summarize", summarize_text, text, result.folder, result.language,
+                                on_chunk, result.timings, result.costs)
+        
+        # 只有总结成功生成后才删除音频文件以节省空间
+        if result.audio_file and os.path.exists(result.audio_file):
+            os.remove(result.audio_file)
+            logger.info(f"🗑️ 已删除音频文件: {result.audio_file}")
+        
+        # 删除转录文件和下载用的视频信息，只保留总结
+        transcript_file = os.path.join(result.folder, "transcript.txt")
+        if os.path.exists(transcript_file):
+            os.remove(transcript_file)
+            logger.info(f"🗑️ 已删除转录文件: {transcript_file}")
+        info_file = os.path.join(result.folder, "info.json")
+        if os.path.exists(info_file):
+            os.remove(info_file)
+            
+    except Exception as e:
+        result.error = str(e)
+        logger.error(f"❌ 总结生成失败: {e}")
+        if result.audio_file:
+            logger.info(f"💾 保留音频文件: {result.audio_file}")
+    
+    result.timings["total"] = round(sum(result.timings.get(stage, 0) for stage in STAGES), 3)
+    return result
+
+
+def summarize_video(video_url, base_dir=None, on_summary_chunk=None):
+    """
+    处理单个视频：获取信息 -> 下载音频 -> 转录 -> 总结
+    
+    Args:
+        video_url (str): YouTube 视频链接
+        base_dir (str): 输出文件夹所在目录，默认为当前目录
+        on_summary_chunk (callable): 流式生成总结时每收到一段文本调用 on_summary_chunk(文本)
+    
+    Returns:
+        SummaryResult: 输出文件夹、总结文本、语言和各阶段耗时。
+            总结失败时 summary 为 None 并保留音频文件；其余阶段失败直接抛出异常
+    """
+    from assemblyai_client import run_coroutine
+    
+    # 边下载边上传时，音频文件一出现就在后台开始转录
+    transcription = []
+    def on_audio_started(result, download_future):
+        transcription.append(run_coroutine(transcribe_stage_async(result, download_future)))
+    
+    with video_context(extract_video_id(video_url)):
+        result = download_stage(video_url, base_dir, on_audio_started)
+        text = transcription[0].result() if transcription else transcribe_stage(result)
+        return summarize_stage(result, text, on_summary_chunk)
 
 
 def print_usage():
@@ -338,6 +937,7 @@ def print_usage():
     print("🎬 YouTube 视频总结器")
     print("使用方法:")
     print("  python yt_summarizer.py <YouTube链接>")
+    print("  python yt_summarizer.py --help")
     print("")
     print("示例:")
     print("  python yt_summarizer.py https://www.youtube.com/watch?v=dQw4w9WgXcQ")
@@ -345,12 +945,16 @@ def print_usage():
     print("")
     print("功能:")
     print("  ✅ 自动下载音频")
-    print("  ✅ AssemblyAI 转录")
-    print("  ✅ Gemini 1.5 Flash 总结")
+    print("  ✅ AssemblyAI 转录（可通过 TRANSCRIPTION_PROVIDER 切换为 whisper / fake）")
+    print("  ✅ Gemini 1.5 Flash 总结（可通过 SUMMARY_PROVIDER 切换为 fake）")
     print("  ✅ 自动文件夹管理")
 
 
 if __name__ == "__main__":
+    if len(sys.argv) == 2 and sys.argv[1] in ("-h", "--help"):
+        print_usage()
+        sys.exit(0)
+    
     # 检查命令行参数
     if len(sys.argv) != 2:
         print("❌ 错误：请提供 YouTube 链接")
@@ -372,36 +976,20 @@ if __name__ == "__main__":
     print("")
     
     try:
-        # 获取视频信息并创建文件夹
-        folder_path = get_video_info_and_create_folder(video_url)
-        
-        # 下载音频
-        audio_file = download_audio(video_url, folder_path)
-        
-        # 转录音频
-        text = transcribe_audio(audio_file, folder_path)
-        
-        # 生成总结
-        try:
-            summary = summarize_text(text, folder_path)
-            
-            
-            # 只有总结成功生成后才删除音频文件以节省空间
-            if os.path.exists(audio_file):
-                os.remove(audio_file)
-                print(f"🗑️ 已删除音频文件: {audio_file}")
-            
-            # 删除转录文件，只保留总结
-            transcript_file = os.path.join(folder_path, "transcript.txt")
-            if os.path.exists(transcript_file):
-                os.remove(transcript_file)
-                print(f"🗑️ 已删除转录文件: {transcript_file}")
-                
-        except Exception as e:
-            print(f"❌ 总结生成失败: {e}")
-            print(f"💾 保留音频文件: {audio_file}")
+        # 总结边生成边输出
+        streamed = []
+        def print_chunk(piece):
+            if not streamed:
+                print("✅ 总结:\n")
+                streamed.append(True)
+            print(piece, end="", flush=True)
         
-        print(f"\n🎉 所有文件已保存到文件夹: {folder_path}")
+        result = summarize_video(video_url, on_summary_chunk=print_chunk)
+        if streamed:
+            print("")
+        if "summarize_first_token" in result.timings:
+            print(f"⏱️ 总结首字耗时: {result.timings['summarize_first_token']:.2f}s")
+        print(f"\n🎉 所有文件已保存到文件夹: {result.folder}")
         
     except KeyboardInterrupt:
         print("\n⚠️ 用户中断操作")